@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,14 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True, scope='session')
+def local_cache():
+    """Кэш в памяти вместо общего файла кэша сайта."""
+    from django.test.utils import override_settings
+
+    from core.testing import CACHES
+
+    with override_settings(CACHES=CACHES):
+        yield
@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_save
+
+        from .auth import invalidate_saved_user
+        user_model = get_user_model()
+        post_save.connect(invalidate_saved_user, sender=user_model)
+        post_delete.connect(invalidate_saved_user, sender=user_model)
@@ -0,0 +1,132 @@
+"""ASGI-приложение поверх WSGI-обработчика Django.
+
+Django 2.2 не умеет ASGI, поэтому соединения принимает цикл событий
+сервера (uvicorn, daphne, hypercorn), а представления выполняются
+в пуле из ASGI_THREADS потоков. Медленные клиенты, keep-alive
+и загрузка тела запроса не занимают поток, поток берётся только
+на время работы представления, так что один процесс держит
+намного больше соединений, чем потоков.
+
+    uvicorn yatube.asgi:application
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+# Заголовки, которые WSGI передаёт без префикса HTTP_.
+PLAIN_HEADERS = {'content-type': 'CONTENT_TYPE',
+                 'content-length': 'CONTENT_LENGTH'}
+
+
+def build_environ(scope, body):
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # WSGI ждёт путь байтами, прочитанными как latin-1.
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin1'),
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = (
+            scope['client'][0], str(scope['client'][1]))
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').lower()
+        key = PLAIN_HEADERS.get(name, 'HTTP_' + name.upper().replace('-', '_'))
+        value = value.decode('latin1')
+        if key in environ:
+            separator = '; ' if key == 'HTTP_COOKIE' else ','
+            value = environ[key] + separator + value
+        environ[key] = value
+    return environ
+
+
+class ASGIHandler:
+
+    def __init__(self, wsgi_application, threads=None):
+        self.wsgi_application = wsgi_application
+        if threads is None:
+            threads = settings.ASGI_THREADS
+        self.executor = ThreadPoolExecutor(max_workers=threads,
+                                           thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемое соединение: {scope["type"]}')
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+
+        def send_from_thread(message):
+            # Поток ждёт отправки: медленный клиент не копит ответ в памяти.
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        try:
+            await loop.run_in_executor(
+                self.executor, self.respond, build_environ(scope, body),
+                send_from_thread)
+        finally:
+            body.close()
+
+    async def read_body(self, receive):
+        """Тело запроса; большие загрузки уходят во временный файл."""
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, mode='w+b')
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                body.seek(0)
+                return body
+
+    def respond(self, environ, send):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers]
+
+        result = self.wsgi_application(environ, start_response)
+        try:
+            send({'type': 'http.response.start', **started})
+            for chunk in result:
+                if chunk:
+                    send({'type': 'http.response.body', 'body': chunk,
+                          'more_body': True})
+            send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # close() шлёт request_finished: Django закроет соединения
+            # с базой этого потока, как после WSGI-запроса.
+            if hasattr(result, 'close'):
+                result.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,101 @@
+"""Пользователь запроса без обращения к базе.
+
+AuthenticationMiddleware на каждый запрос достаёт пользователя по id
+из сессии. CachedModelBackend ищет его сначала в словаре процесса,
+затем в общем кэше и только потом в базе. Строка пользователя лежит
+в кэше под номером версии user:<id>:version, который увеличивается
+при любом сохранении или удалении пользователя, поэтому смена пароля
+в одном воркере сразу видна остальным: проверка хэша сессии идёт
+уже по новому паролю. Внутри транзакции (админка, смена пароля) версия
+увеличивается ещё раз после фиксации: строку, прочитанную до неё
+другим запросом, кэш не сохранит под новой версией. Каждому запросу
+отдаётся свой экземпляр модели, чтобы закэшированные на нём связи
+(request.user.stats и т. п.) не переходили из запроса в запрос.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+_users = OrderedDict()
+_lock = threading.Lock()
+
+
+def version_key(user_id):
+    return f'user:{user_id}:version'
+
+
+def user_version(user_id):
+    version = cache.get(version_key(user_id))
+    if version is None:
+        # Как у версии кэша главной: после вытеснения ключа начинаем
+        # с текущего времени, а не с версии, под которой лежат старые
+        # данные.
+        cache.add(version_key(user_id), int(time.time() * 1000), None)
+        version = cache.get(version_key(user_id))
+    return version
+
+
+def invalidate_user(user_id):
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        user_version(user_id)
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def _field_names():
+    return [field.attname for field in get_user_model()._meta.concrete_fields]
+
+
+def _load_row(user_id, version):
+    key = f'user:{user_id}:{version}'
+    row = cache.get(key)
+    if row is None:
+        row = get_user_model()._default_manager.filter(
+            pk=user_id).values_list(*_field_names()).first()
+        if row is None:
+            return None
+        cache.set(key, row, settings.USER_CACHE_TIMEOUT)
+    return row
+
+
+def get_cached_user(user_id):
+    version = user_version(user_id)
+    with _lock:
+        entry = _users.get(user_id)
+        if entry is not None and entry[0] == version:
+            _users.move_to_end(user_id)
+            row = entry[1]
+        else:
+            row = None
+    if row is None:
+        row = _load_row(user_id, version)
+        if row is None:
+            return None
+        with _lock:
+            _users[user_id] = (version, row)
+            _users.move_to_end(user_id)
+            while len(_users) > settings.USER_CACHE_SIZE:
+                _users.popitem(last=False)
+    return get_user_model().from_db(DEFAULT_DB_ALIAS, _field_names(), row)
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кэша."""
+
+    def get_user(self, user_id):
+        user = get_cached_user(int(user_id))
+        return user if user and self.user_can_authenticate(user) else None
+
+
+def invalidate_saved_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    invalidate_user(user_id)
+    transaction.on_commit(lambda: invalidate_user(user_id))
@@ -0,0 +1,269 @@
+"""Кэш в файле SQLite, общий для всех процессов на одной машине.
+
+В отличие от LocMemCache, воркеры gunicorn видят одни и те же ключи,
+поэтому у них общий процент попаданий и одинаковые фрагменты страниц.
+Журнал WAL позволяет читать параллельно с записью. Просроченные ключи
+удаляются, а при превышении MAX_ENTRIES вытесняются давно не читанные
+(LRU) не на каждой записи, а с вероятностью CULL_PROBABILITY, поэтому
+число ключей может ненадолго превысить MAX_ENTRIES. incr атомарен
+между процессами за счёт BEGIN IMMEDIATE. Попадания и промахи
+копятся в процессе и сбрасываются в таблицу статистики пачками.
+
+    CACHES = {'default': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+    }}
+"""
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Время последнего чтения обновляется не чаще раза в столько секунд,
+# чтобы горячие ключи не превращали каждое чтение в запись.
+LRU_RESOLUTION = 1
+# Ключей в одном IN: меньше лимита переменных старых сборок SQLite.
+MAX_VARIABLES = 900
+STATS = ('hits', 'misses', 'sets', 'deletes', 'evictions')
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB '
+    'NOT NULL, expires REAL, accessed REAL NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, '
+    'value INTEGER NOT NULL)',
+)
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self.stats_flush = options.get('STATS_FLUSH', 100)
+        self.cull_probability = options.get('CULL_PROBABILITY', 0.01)
+        self._local = threading.local()
+        self._pending = dict.fromkeys(STATS, 0)
+        self._pending_lock = threading.Lock()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _write(self):
+        """Транзакция с блокировкой записи сразу, а не при первом UPDATE."""
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _count(self, name, amount=1):
+        if not amount:
+            return
+        with self._pending_lock:
+            self._pending[name] += amount
+            if sum(self._pending.values()) < self.stats_flush:
+                return
+            pending = self._pending
+            self._pending = dict.fromkeys(STATS, 0)
+        self._flush(pending)
+
+    def _flush(self, pending):
+        rows = [(name, value) for name, value in pending.items() if value]
+        if not rows:
+            return
+        with self._write() as connection:
+            connection.executemany(
+                'INSERT INTO stats (name, value) VALUES (?, ?) ON CONFLICT '
+                '(name) DO UPDATE SET value = value + excluded.value', rows)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _alive(expires, now):
+        return expires is None or expires > now
+
+    def _cull(self, connection):
+        """Удаляет просроченные и давно не читанные ключи.
+
+        Срабатывает на доле записей CULL_PROBABILITY, возвращает число
+        вытесненных живых ключей.
+        """
+        if random.random() >= self.cull_probability:
+            return 0
+        connection.execute('DELETE FROM cache WHERE expires <= ?',
+                           [time.time()])
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return 0
+        if self._cull_frequency:
+            count //= self._cull_frequency
+        connection.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'ORDER BY accessed LIMIT ?)', [count])
+        return count
+
+    def _touch_read(self, keys, accessed, now):
+        stale = [(now, key) for key in keys
+                 if now - accessed[key] >= LRU_RESOLUTION]
+        if stale:
+            self.connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', stale)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._get_many([key]).get(key, default)
+
+    def _get_many(self, keys):
+        now = time.time()
+        rows = []
+        for start in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[start:start + MAX_VARIABLES]
+            rows += self.connection.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                chunk).fetchall()
+        found = {}
+        accessed = {}
+        for key, value, expires, last_access in rows:
+            if self._alive(expires, now):
+                found[key] = pickle.loads(value)
+                accessed[key] = last_access
+        self._touch_read(found, accessed, now)
+        self._count('hits', len(found))
+        self._count('misses', len(keys) - len(found))
+        return found
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        return {keys[key]: value
+                for key, value in self._get_many(list(keys)).items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._set_many({key: value}, timeout)
+
+    def _set_many(self, data, timeout):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = [(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires,
+                 now) for key, value in data.items()]
+        with self._write() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)', rows)
+            evicted = self._cull(connection)
+        self._count('sets', len(rows))
+        self._count('evictions', evicted)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set_many({self._key(key, version): value
+                        for key, value in data.items()}, timeout)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?', [key, now])
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                [key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                 self.get_backend_timeout(timeout), now]).rowcount == 1
+            evicted = self._cull(connection) if added else 0
+        self._count('sets', int(added))
+        self._count('evictions', evicted)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                [key]).fetchone()
+            if row is None or not self._alive(row[1], time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                [pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        with self._write() as connection:
+            return connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? AND '
+                '(expires IS NULL OR expires > ?)',
+                [expires, key, time.time()]).rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self.connection.execute(
+            'SELECT expires FROM cache WHERE key = ?', [key]).fetchone()
+        return row is not None and self._alive(row[0], time.time())
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        with self._write() as connection:
+            connection.executemany('DELETE FROM cache WHERE key = ?', keys)
+        self._count('deletes', len(keys))
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+            connection.execute('DELETE FROM stats')
+        with self._pending_lock:
+            self._pending = dict.fromkeys(STATS, 0)
+
+    def stats(self):
+        """Счётчики всех процессов и число ключей в кэше."""
+        with self._pending_lock:
+            pending = self._pending
+            self._pending = dict.fromkeys(STATS, 0)
+        self._flush(pending)
+        stats = dict.fromkeys(STATS, 0)
+        stats.update(self.connection.execute(
+            'SELECT name, value FROM stats').fetchall())
+        stats['entries'] = self.connection.execute(
+            'SELECT COUNT(*) FROM cache').fetchone()[0]
+        reads = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / reads if reads else None
+        return stats
+
+    def close(self, **kwargs):
+        # Соединение живёт весь поток, как у LocMemCache, а не запрос.
+        pass
@@ -0,0 +1,95 @@
+"""Независимые запросы представления — одновременно, в пуле потоков.
+
+В Django 2.2 нет асинхронных представлений и ORM, поэтому запросы,
+которые не зависят друг от друга (страница ленты, счётчики автора,
+проверка подписки), уходят в базу из QUERY_WORKERS потоков, каждый
+по своему соединению, и время ответа складывается из самого долгого
+запроса, а не из суммы. Внутри транзакции (тесты, ATOMIC_REQUESTS)
+другие соединения её данных не видят, и задачи выполняются по очереди
+в текущем потоке. Запросы потоков пула засчитываются таймерам
+вызывающего потока (core.timing).
+
+Пул общий для всех потоков представлений (ASGI_THREADS), и задачи
+не ждут в его очереди: если свободных потоков меньше, чем задач,
+остальные выполняются в потоке запроса, а при занятом пуле — все.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+from .replicas import reading_from_replica, use_replica
+from .timing import active_timers
+
+_executor = None
+# Задачи, отправленные в пул и ещё не выполненные.
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.QUERY_WORKERS,
+                                       thread_name_prefix='queries')
+    return _executor
+
+
+def _reserve(wanted):
+    """Занимает до wanted потоков пула, возвращает, сколько занято."""
+    global _in_flight
+    with _in_flight_lock:
+        reserved = max(0, min(wanted, settings.QUERY_WORKERS - _in_flight))
+        _in_flight += reserved
+    return reserved
+
+
+def _release(future):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+def _run(function, replica, timers):
+    # Как request_started и request_finished для потоков запросов:
+    # соединения потока пула закрываются по CONN_MAX_AGE и после
+    # ошибок, а не живут, пока на мёртвом не упадёт запрос.
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            for timer in timers:
+                stack.enter_context(timer.watch())
+            if replica:
+                stack.enter_context(use_replica())
+            return function()
+    finally:
+        close_old_connections()
+
+
+def gather(**tasks):
+    """Выполняет функции без аргументов, возвращает словарь результатов.
+
+    Функции должны сами выполнять запросы: ленивый QuerySet из потока
+    пула выполнится уже в вызывающем потоке. Исключение любой задачи
+    пробрасывается.
+    """
+    if (len(tasks) < 2 or not settings.QUERY_WORKERS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+        return {name: function() for name, function in tasks.items()}
+    reserved = _reserve(len(tasks))
+    if not reserved:
+        return {name: function() for name, function in tasks.items()}
+    replica = reading_from_replica()
+    timers = active_timers()
+    names = list(tasks)
+    futures = {}
+    for name in names[:reserved]:
+        futures[name] = get_executor().submit(_run, tasks[name], replica,
+                                              timers)
+        futures[name].add_done_callback(_release)
+    results = {name: tasks[name]() for name in names[reserved:]}
+    results.update(
+        (name, future.result()) for name, future in futures.items())
+    return {name: results[name] for name in names}
@@ -0,0 +1,27 @@
+import json
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания, промахи и вытеснения общего кэша'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not hasattr(cache, 'stats'):
+            raise CommandError(
+                f'Кэш {options["alias"]} не ведёт статистику, '
+                'нужен core.cache.SQLiteCache')
+        stats = cache.stats()
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+        for name, value in stats.items():
+            if name == 'hit_rate' and value is not None:
+                value = f'{value:.1%}'
+            self.stdout.write(f'{name:<10} {value}')
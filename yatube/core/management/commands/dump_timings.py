@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.timing import collect
+
+
+class Command(BaseCommand):
+    help = 'Показывает собранные TimingMiddleware замеры по именам URL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--windows', type=int,
+                            help='Сколько последних окон учитывать')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        stats = collect(options['windows'])
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+        if not stats:
+            self.stdout.write('Замеров нет. Включён ли REQUEST_TIMING?')
+        for name, view in sorted(stats.items(),
+                                 key=lambda item: -item[1]['total_us']):
+            self.stdout.write(
+                f'{name:<28} {view["count"]:>7} запр.  '
+                f'среднее {view["mean_ms"]:>8.2f} мс  '
+                f'p50≤{view["p50_ms"]} p95≤{view["p95_ms"]} '
+                f'p99≤{view["p99_ms"]} мс  '
+                f'БД {view["db_ms"]:.2f} мс / {view["mean_queries"]:.1f} SQL  '
+                f'шаблоны {view["template_ms"]:.2f} мс')
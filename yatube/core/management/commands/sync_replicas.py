@@ -0,0 +1,33 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.replicas import mark_synced
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик '
+            '(для проверки чтения с реплик на своей машине)')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Копировать можно только базу SQLite')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены, задайте YATUBE_REPLICAS')
+        primary.ensure_connection()
+        started = time.time()
+        for alias in settings.DATABASE_REPLICAS:
+            path = settings.DATABASES[alias]['NAME']
+            # backup() копирует согласованный снимок даже во время записи.
+            replica = sqlite3.connect(path)
+            try:
+                primary.connection.backup(replica)
+            finally:
+                replica.close()
+            self.stdout.write(f'{alias}: {path}')
+        # Изменения, сделанные после начала копирования, могли не попасть.
+        mark_synced(started)
@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import replicas, timing
+
+
+class TimingMiddleware:
+    """Замеряет SQL, шаблоны и общее время каждого запроса.
+
+    Включается настройкой REQUEST_TIMING: добавляет заголовок
+    Server-Timing и копит гистограммы по именам URL.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with timing.RequestTimer() as timer:
+            response = self.get_response(request)
+        match = request.resolver_match
+        response['Server-Timing'] = timer.server_timing()
+        timing.record(match.view_name if match else timing.UNRESOLVED, timer)
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет за основной базой клиента, который только что писал.
+
+    Стоит снаружи SessionMiddleware, чтобы учесть и запись сессии.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with replicas.track_writes() as state:
+            response = self.get_response(request)
+        if state.wrote:
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                replicas.PIN_COOKIE, str(time.time() + seconds),
+                max_age=seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,121 @@
+"""Чтение лент и страниц постов с реплик базы.
+
+Представления, обёрнутые read_from_replica, читают с одной из баз
+DATABASE_REPLICAS, всё остальное, включая любые записи, идёт в основную
+базу. Запись в запросе сразу переключает его чтения на основную базу,
+а ReplicaPinMiddleware ставит клиенту куку, по которой следующие
+REPLICA_PIN_SECONDS секунд он тоже читает с основной: автор видит свой
+пост и комментарий, даже если реплика ещё не догнала основную базу.
+
+Локально реплики — копии файла SQLite (YATUBE_REPLICAS, команда
+sync_replicas); у настоящих реплик отставание должно быть заметно
+меньше времени закрепления.
+
+Страницы, которые кэшируются под метками изменений (фрагменты главной,
+ленты, API, ETag), нельзя строить по реплике, ещё не получившей
+изменение: устаревшая страница легла бы в кэш под новой меткой.
+Такие запросы переключает на основную базу require_fresh().
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_until'
+# Время, до которого реплики получили все изменения; ставит sync_replicas.
+SYNCED_KEY = 'replicas_synced_at'
+
+_state = threading.local()
+
+
+@contextmanager
+def use_replica():
+    previous = getattr(_state, 'replica', False)
+    _state.replica = True
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def reading_from_replica():
+    return getattr(_state, 'replica', False)
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def mark_synced(at):
+    cache.set(SYNCED_KEY, at, None)
+
+
+def replicas_have(changed_at):
+    """Есть ли на репликах изменение, сделанное в changed_at.
+
+    Без отметки sync_replicas считаем, что реплики отстают
+    не больше REPLICA_PIN_SECONDS.
+    """
+    synced = cache.get(SYNCED_KEY)
+    if synced is None:
+        synced = time.time() - settings.REPLICA_PIN_SECONDS
+    return changed_at < synced
+
+
+def require_fresh(changed_at):
+    """Дальше запрос читает с основной базы, если реплики отстают."""
+    if reading_from_replica() and not replicas_have(changed_at):
+        _state.replica = False
+
+
+def read_from_replica(view):
+    """Чтения представления — с реплики, если клиент недавно не писал."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (not settings.DATABASE_REPLICAS
+                or request.method not in ('GET', 'HEAD')
+                or is_pinned(request)):
+            return view(request, *args, **kwargs)
+        with use_replica():
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def track_writes():
+    """Отмечает, писал ли код внутри блока в базу."""
+    _state.wrote = False
+    try:
+        yield _state
+    finally:
+        _state.replica = False
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if reading_from_replica() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # После записи до конца запроса читаем свои же данные.
+        _state.replica = False
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,8 @@
+from django import template
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page):
+    """Номера страниц вокруг текущей; пропуски — paginator.ELLIPSIS."""
+    return list(page.paginator.get_elided_page_range(page))
@@ -0,0 +1,30 @@
+"""Запуск тестов на кэше в памяти процесса.
+
+Общий файл кэша (core.cache.SQLiteCache) лежит рядом с кодом и виден
+запущенному сайту, поэтому тесты в него не пишут: TestRunner
+подменяет CACHES на время прогона manage.py test, а для pytest ту же
+подмену делает фикстура в tests/conftest.py.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_settings(CACHES=CACHES)
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,493 @@
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.wsgi import get_wsgi_application
+from django.db import OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.template import engines
+from django.template.backends import django as django_backend
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import auth, replicas
+from core.asgi import ASGIHandler
+from core.backends.sqlite3.base import DatabaseWrapper
+from core.cache import SQLiteCache
+from core.concurrent import gather
+from core.timing import (BUCKETS_MS, RequestTimer, collect, current_window,
+                         flush)
+from posts.models import Group, Post, User
+
+
+@override_settings(REQUEST_TIMING=True)
+class TimingMiddlewareTests(TestCase):
+    def setUp(self):
+        flush()
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_server_timing_header(self):
+        response = self.guest_client.get('/')
+        header = response['Server-Timing']
+        for metric in ('db;desc=', 'tpl;dur=', 'total;dur='):
+            self.assertIn(metric, header)
+
+    def test_histograms_by_url_name(self):
+        for _ in range(3):
+            self.guest_client.get('/')
+        self.guest_client.get('/about/tech/')
+        stats = collect()
+        self.assertEqual(stats['posts:index']['count'], 3)
+        self.assertEqual(sum(stats['posts:index']['buckets']), 3)
+        self.assertEqual(
+            len(stats['posts:index']['buckets']), len(BUCKETS_MS) + 1)
+        self.assertGreater(stats['posts:index']['queries'], 0)
+        self.assertGreater(stats['posts:index']['template_us'], 0)
+        self.assertEqual(stats['about:tech']['count'], 1)
+        out = StringIO()
+        call_command('dump_timings', stdout=out)
+        self.assertIn('posts:index', out.getvalue())
+
+    def test_template_backend_times_rendering(self):
+        """Время шаблонов считает бэкенд из TEMPLATES, без подмены Django"""
+        template = engines['django'].from_string('{{ value }}')
+        self.assertEqual(template.render({'value': 1}), '1')
+        with RequestTimer() as timer:
+            self.assertEqual(template.render({'value': 2}), '2')
+        self.assertGreater(timer.template, 0)
+        self.assertFalse(hasattr(django_backend.Template.render,
+                                 '__wrapped__'))
+
+    @override_settings(REQUEST_TIMING_FLUSH=60)
+    def test_counters_flushed_in_batches(self):
+        """Счётчики пишутся в кэш не на каждый запрос, а пачкой"""
+        key = f'timing:{current_window()}:posts:index:count'
+        with mock.patch('core.timing._flushed_at', time.monotonic()):
+            for _ in range(3):
+                self.guest_client.get('/')
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(collect()['posts:index']['count'], 3)
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_disabled_by_default(self):
+        response = Client().get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+def increment(path, times):
+    shared = SQLiteCache(path, {})
+    for _ in range(times):
+        shared.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def test_basic_operations(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'other'))
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'missing']),
+                         {'a': 1, 'b': 2})
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.incr('b', 5), 7)
+        with self.assertRaises(ValueError):
+            self.cache.incr('a')
+        self.cache.set('expired', 1, timeout=-1)
+        self.assertFalse(self.cache.has_key('expired'))
+        self.assertTrue(self.cache.add('expired', 2))
+
+    def test_shared_between_instances(self):
+        """Второй экземпляр, как другой воркер, видит те же ключи"""
+        self.cache.set('key', 'value')
+        self.assertEqual(SQLiteCache(self.path, {}).get('key'), 'value')
+
+    def test_incr_is_atomic_between_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=increment, args=(self.path, 50))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    @mock.patch('core.cache.LRU_RESOLUTION', 0)
+    def test_lru_eviction(self):
+        lru = SQLiteCache(self.path, {
+            'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3,
+                        'CULL_PROBABILITY': 1}})
+        for key in ('a', 'b', 'c'):
+            lru.set(key, key)
+        lru.get('a')
+        lru.set('d', 'd')
+        self.assertEqual(lru.get_many(['a', 'b', 'c', 'd']),
+                         {'a': 'a', 'c': 'c', 'd': 'd'})
+        self.assertEqual(lru.stats()['evictions'], 1)
+
+    def test_cull_is_sampled(self):
+        """Без выпавшей вероятности запись не вытесняет ключи"""
+        sampled = SQLiteCache(self.path, {
+            'OPTIONS': {'MAX_ENTRIES': 1, 'CULL_PROBABILITY': 0}})
+        sampled.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(len(sampled.get_many(['a', 'b', 'c'])), 3)
+        plan = sampled.connection.execute(
+            'EXPLAIN QUERY PLAN DELETE FROM cache WHERE expires <= 0'
+        ).fetchall()
+        self.assertIn('cache_expires', str(plan))
+
+    def test_stats(self):
+        self.cache.set('key', 'value')
+        self.cache.get('key')
+        self.cache.get('missing')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']),
+                         (1, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'core.cache.SQLiteCache', 'LOCATION': self.path}}):
+            out = StringIO()
+            call_command('cache_stats', stdout=out)
+        self.assertIn('50.0%', out.getvalue())
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='user', password='old-password')
+        self.client.login(username='user', password='old-password')
+        self.other_client = Client()
+        self.other_client.login(username='user', password='old-password')
+
+    def test_session_and_user_are_cached(self):
+        """Повторный запрос не читает сессию и пользователя из базы"""
+        self.client.get('/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/')
+        self.assertEqual(response.context['user'], self.user)
+        for query in queries:
+            self.assertNotIn('django_session', query['sql'])
+            self.assertNotIn('auth_user', query['sql'])
+
+    def test_fresh_instance_per_request(self):
+        first = auth.get_cached_user(self.user.pk)
+        first.first_name = 'Изменено'
+        self.assertEqual(auth.get_cached_user(self.user.pk).first_name, '')
+
+    def test_password_change_logs_out_other_sessions(self):
+        follow_url = reverse('posts:follow_index')
+        self.assertEqual(self.other_client.get(follow_url).status_code, 200)
+        self.user.set_password('new-password')
+        self.user.save()
+        response = self.other_client.get(follow_url)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('users:login'), response['Location'])
+
+    def test_logout(self):
+        self.client.get('/')
+        self.client.get(reverse('users:logout'))
+        self.assertFalse(self.client.get('/').context['user']
+                         .is_authenticated)
+        self.assertTrue(self.other_client.get('/').context['user']
+                        .is_authenticated)
+
+
+def read_alias(request):
+    return HttpResponse(replicas.ReplicaRouter().db_for_read(None))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = replicas.ReplicaRouter()
+        self.view = replicas.read_from_replica(read_alias)
+        self.factory = RequestFactory()
+
+    def test_reads_go_to_primary_by_default(self):
+        self.assertEqual(self.router.db_for_read(None), 'default')
+        self.assertEqual(self.router.db_for_write(None), 'default')
+
+    def test_marked_views_read_from_replica(self):
+        request = self.factory.get('/')
+        self.assertEqual(self.view(request).content, b'replica1')
+        self.assertEqual(self.router.db_for_read(None), 'default')
+        post = self.factory.post('/')
+        self.assertEqual(self.view(post).content, b'default')
+
+    def test_write_switches_request_to_primary(self):
+        with replicas.use_replica():
+            self.assertEqual(self.router.db_for_read(None), 'replica1')
+            self.router.db_for_write(None)
+            self.assertEqual(self.router.db_for_read(None), 'default')
+
+    def test_writer_is_pinned_to_primary(self):
+        """После записи клиент какое-то время читает с основной базы"""
+        client = Client()
+        client.force_login(get_user_model().objects.create_user('writer'))
+        response = client.post(reverse('posts:post_create'), {'text': 'x'})
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        request = self.factory.get('/')
+        request.COOKIES = {
+            replicas.PIN_COOKIE: response.cookies[replicas.PIN_COOKIE].value}
+        self.assertEqual(self.view(request).content, b'default')
+        request.COOKIES = {replicas.PIN_COOKIE: '0'}
+        self.assertEqual(self.view(request).content, b'replica1')
+
+    def test_recent_changes_are_read_from_primary(self):
+        """Страница с изменением, которого нет на реплике, — с основной"""
+        with replicas.use_replica():
+            replicas.require_fresh(time.time() - 60)
+            self.assertEqual(self.router.db_for_read(None), 'replica1')
+            replicas.require_fresh(time.time())
+            self.assertEqual(self.router.db_for_read(None), 'default')
+        # Метка главной только что создана: страница и фрагмент в кэше
+        # строятся по основной базе, реплика не нужна.
+        self.assertEqual(Client().get(reverse('posts:index')).status_code,
+                         200)
+
+    def test_sync_mark_bounds_replica_freshness(self):
+        replicas.mark_synced(100)
+        self.assertTrue(replicas.replicas_have(50))
+        self.assertFalse(replicas.replicas_have(150))
+
+    def test_reads_do_not_pin(self):
+        response = Client().get(reverse('posts:search'), {'q': 'текст'})
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+
+class SyncReplicasTests(TransactionTestCase):
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_sync_replicas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'replica.sqlite3')
+            with mock.patch.dict(settings.DATABASES,
+                                 {'replica1': {'NAME': path}}):
+                started = time.time()
+                call_command('sync_replicas', stdout=StringIO())
+            self.assertGreaterEqual(cache.get(replicas.SYNCED_KEY), started)
+            copy = sqlite3.connect(path)
+            tables = {name for name, in copy.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'")}
+            copy.close()
+        self.assertIn('posts_post', tables)
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+
+    def wrapper(self, **options):
+        settings_dict = {**connection.settings_dict, 'NAME': self.path,
+                         'OPTIONS': options}
+        wrapper = DatabaseWrapper(settings_dict, 'backend-test')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_pragmas_on_connect(self):
+        wrapper = self.wrapper(pragmas={'cache_size': -1000})
+        with wrapper.cursor() as cursor:
+            for pragma, value in [('journal_mode', 'wal'),
+                                  ('busy_timeout', 5000),
+                                  ('synchronous', 1),
+                                  ('cache_size', -1000),
+                                  ('foreign_keys', 1)]:
+                with self.subTest(pragma=pragma):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    self.assertEqual(cursor.fetchone()[0], value)
+
+    def test_writer_waits_and_retries(self):
+        """Писатель ждёт занятую блокировку записи, а не падает сразу"""
+        holder = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(holder.close)
+        holder.execute('BEGIN IMMEDIATE')
+        busy = self.wrapper(pragmas={'busy_timeout': 10}, write_retries=1)
+        with self.assertRaisesMessage(OperationalError, 'locked'):
+            with busy.cursor():
+                busy._start_transaction_under_autocommit()
+        with mock.patch('core.backends.sqlite3.base.time.sleep',
+                        side_effect=lambda delay: holder.execute('COMMIT')):
+            busy._start_transaction_under_autocommit()
+        busy.cursor().execute('COMMIT')
+
+    def test_unknown_transaction_mode(self):
+        wrapper = self.wrapper(transaction_mode='lazy')
+        with self.assertRaises(ValueError):
+            wrapper._start_transaction_under_autocommit()
+
+
+def current_thread_name():
+    return threading.current_thread().name
+
+
+class CachedUserCommitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_row_cached_before_commit_is_dropped(self):
+        user = get_user_model().objects.create_user(
+            username='user', password='old-password')
+        old_row = get_user_model().objects.filter(pk=user.pk).values_list(
+            *auth._field_names()).first()
+        with transaction.atomic():
+            user.set_password('new-password')
+            user.save()
+            # Другой запрос успел прочитать строку до фиксации.
+            cache.set(f'user:{user.pk}:{auth.user_version(user.pk)}',
+                      old_row)
+        self.assertTrue(
+            auth.get_cached_user(user.pk).check_password('new-password'))
+
+
+class ConcurrentQueriesTests(TransactionTestCase):
+    def test_gather_runs_tasks_in_pool(self):
+        results = gather(first=current_thread_name,
+                         second=lambda: User.objects.count())
+        self.assertTrue(results['first'].startswith('queries'))
+        self.assertEqual(results['second'], 0)
+
+    def test_gather_inside_transaction_runs_inline(self):
+        """Внутри транзакции другие соединения её не видят"""
+        with transaction.atomic():
+            User.objects.create_user('inside')
+            results = gather(thread=current_thread_name,
+                             users=lambda: User.objects.count())
+        self.assertEqual(results, {'thread': current_thread_name(),
+                                   'users': 1})
+
+    def test_gather_runs_inline_when_pool_is_busy(self):
+        with mock.patch('core.concurrent._in_flight', settings.QUERY_WORKERS):
+            results = gather(first=current_thread_name,
+                             second=current_thread_name)
+        self.assertEqual(set(results.values()), {current_thread_name()})
+
+    @override_settings(QUERY_WORKERS=1)
+    def test_gather_splits_tasks_when_pool_is_short(self):
+        results = gather(first=current_thread_name,
+                         second=current_thread_name)
+        self.assertTrue(results['first'].startswith('queries'))
+        self.assertEqual(results['second'], current_thread_name())
+
+    def test_pool_closes_old_connections(self):
+        """Соединения пула проверяются до и после задачи, как у запроса"""
+        # Тестовую базу SQLite в памяти Django не закрывает, поэтому
+        # проверяем вызовы, а не закрытые соединения.
+        with mock.patch('core.concurrent.close_old_connections') as close:
+            gather(first=current_thread_name, second=current_thread_name)
+        self.assertEqual(close.call_count, 4)
+
+    def test_gather_raises_task_errors(self):
+        with self.assertRaises(ZeroDivisionError):
+            gather(ok=lambda: 1, broken=lambda: 1 / 0)
+
+    def test_gather_counts_pool_queries_in_timers(self):
+        with RequestTimer() as outer:
+            with RequestTimer() as inner:
+                gather(users=lambda: User.objects.count(),
+                       groups=lambda: list(Group.objects.all()))
+        self.assertEqual((outer.queries, inner.queries), (2, 2))
+        gather(users=lambda: User.objects.count(),
+               groups=lambda: list(Group.objects.all()))
+        self.assertEqual(outer.queries, 2)
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_gather_keeps_replica_reads(self):
+        router = replicas.ReplicaRouter()
+        with replicas.use_replica():
+            results = gather(first=lambda: router.db_for_read(None),
+                             second=lambda: router.db_for_read(None))
+        self.assertEqual(set(results.values()), {'replica1'})
+
+    def test_views_render_with_concurrent_queries(self):
+        author = User.objects.create_user('author')
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(text='Пост', author=author, group=group)
+        client = Client()
+        client.force_login(User.objects.create_user('reader'))
+        for url in [reverse('posts:group_list', args=[group.slug]),
+                    reverse('posts:profile', args=[author.username]),
+                    reverse('posts:post_detail', args=[post.id])]:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertContains(response, 'Пост')
+        response = client.get(reverse('posts:group_list', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+
+class ASGIHandlerTests(TransactionTestCase):
+    def setUp(self):
+        self.application = ASGIHandler(get_wsgi_application(), threads=2)
+        self.addCleanup(self.application.executor.shutdown)
+
+    def request(self, path, query=b'', headers=(), body=b''):
+        scope = {'type': 'http', 'method': 'GET', 'path': path,
+                 'query_string': query, 'headers': list(headers),
+                 'http_version': '1.1', 'scheme': 'http',
+                 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000)}
+        incoming = [{'type': 'http.request', 'body': body}]
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.application(scope, receive, send))
+        return sent
+
+    def test_get_page(self):
+        sent = self.request(reverse('posts:search'), b'q=%D1%82%D0%B5',
+                            [(b'host', b'testserver'),
+                             (b'accept-language', b'ru')])
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/html; charset=utf-8'),
+                      sent[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertIn('те'.encode(), body)
+        self.assertFalse(sent[-1].get('more_body'))
+
+    def test_not_found(self):
+        sent = self.request('/нет-такой-страницы/',
+                            headers=[(b'host', b'testserver')])
+        self.assertEqual(sent[0]['status'], 404)
+
+    def test_lifespan(self):
+        messages = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(self.application({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
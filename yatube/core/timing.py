@@ -0,0 +1,240 @@
+"""Замеры времени запросов по именам URL.
+
+Каждый запрос добавляет число SQL-запросов, время в БД, в шаблонах
+и общее время в счётчики процесса, которые раз в REQUEST_TIMING_FLUSH
+секунд прибавляются к счётчикам кэша. Счётчики разложены по окнам
+REQUEST_TIMING_WINDOW секунд и живут REQUEST_TIMING_WINDOWS окон,
+поэтому гистограммы скользящие и видны из любого процесса,
+который смотрит в тот же кэш (команда dump_timings). Имена
+представлений берутся из URLconf, отдельного списка в кэше нет.
+
+Время шаблонов замеряет бэкенд core.backends.templates, выбранный
+в TEMPLATES. Запросы, которые представление выполняет в потоках пула
+(core.concurrent.gather), засчитываются таймеру запроса, поэтому
+время в БД — сумма по всем потокам и может быть больше общего.
+"""
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.urls import URLResolver, get_resolver
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+FIELDS = ('count', 'total_us', 'db_us', 'template_us', 'queries')
+
+UNRESOLVED = 'unresolved'
+
+_local = threading.local()
+# Ещё не записанные в кэш счётчики процесса: (окно, имя) -> поле -> число.
+_pending = {}
+_pending_lock = threading.Lock()
+_flushed_at = 0.0
+
+
+@contextmanager
+def rendering():
+    """Засчитывает время блока таймеру потока как рендеринг шаблонов.
+
+    Вызывается бэкендом шаблонов core.backends.templates; вложенный
+    рендеринг (render_to_string внутри шаблона) не считается дважды.
+    """
+    timer = getattr(_local, 'timer', None)
+    if timer is None or timer.rendering:
+        yield
+        return
+    timer.rendering = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.template += time.perf_counter() - started
+        timer.rendering = False
+
+
+def active_timers():
+    """Таймеры текущего потока, от вложенного к внешнему."""
+    timers = []
+    timer = getattr(_local, 'timer', None)
+    while timer is not None:
+        timers.append(timer)
+        timer = timer.parent
+    return timers
+
+
+class RequestTimer:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.total = 0.0
+        self.rendering = False
+        self.parent = None
+        # Запросы приходят и из потоков пула.
+        self._lock = threading.Lock()
+
+    def _execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.db += elapsed
+                self.queries += 1
+
+    @contextmanager
+    def watch(self):
+        """Засчитывает таймеру запросы соединений текущего потока."""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(self._execute))
+            yield self
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        self._stack.enter_context(self.watch())
+        self.parent = getattr(_local, 'timer', None)
+        _local.timer = self
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.total = time.perf_counter() - self._started
+        _local.timer = self.parent
+        self._stack.close()
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;desc="{self.queries} queries";dur={self.db * 1000:.1f}',
+            f'tpl;dur={self.template * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+
+def get_cache():
+    return caches[settings.REQUEST_TIMING_CACHE]
+
+
+def current_window():
+    return int(time.time() // settings.REQUEST_TIMING_WINDOW)
+
+
+def bucket(total_ms):
+    for index, limit in enumerate(BUCKETS_MS):
+        if total_ms <= limit:
+            return index
+    return len(BUCKETS_MS)
+
+
+def _incr(cache, key, delta, timeout):
+    if cache.add(key, delta, timeout):
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, delta, timeout)
+
+
+def record(view_name, timer):
+    global _flushed_at
+    values = {
+        'count': 1,
+        'total_us': int(timer.total * 1e6),
+        'db_us': int(timer.db * 1e6),
+        'template_us': int(timer.template * 1e6),
+        'queries': timer.queries,
+        f'bucket{bucket(timer.total * 1000)}': 1,
+    }
+    with _pending_lock:
+        counters = _pending.setdefault((current_window(), view_name), {})
+        for field, delta in values.items():
+            counters[field] = counters.get(field, 0) + delta
+        due = time.monotonic() - _flushed_at >= settings.REQUEST_TIMING_FLUSH
+        if due:
+            _flushed_at = time.monotonic()
+    if due:
+        flush()
+
+
+def flush():
+    """Прибавляет накопленные в процессе счётчики к счётчикам кэша."""
+    global _pending
+    with _pending_lock:
+        pending, _pending = _pending, {}
+    cache = get_cache()
+    timeout = settings.REQUEST_TIMING_WINDOW * settings.REQUEST_TIMING_WINDOWS
+    for (window, view_name), counters in pending.items():
+        for field, delta in counters.items():
+            _incr(cache, f'timing:{window}:{view_name}:{field}', delta,
+                  timeout)
+
+
+def view_names(resolver=None, namespace=''):
+    """Имена URL, как их видит resolver_match.view_name."""
+    if resolver is None:
+        resolver = get_resolver()
+        yield UNRESOLVED
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            inner = namespace
+            if pattern.namespace:
+                inner = f'{namespace}{pattern.namespace}:'
+            yield from view_names(pattern, inner)
+        else:
+            yield namespace + (pattern.name or pattern.lookup_str)
+
+
+def percentile(buckets, count, percent):
+    """Оценка перцентиля по гистограмме: верхняя граница корзины."""
+    rank = count * percent / 100
+    seen = 0
+    for index, amount in enumerate(buckets):
+        seen += amount
+        if amount and seen >= rank:
+            return BUCKETS_MS[index] if index < len(BUCKETS_MS) else None
+    return None
+
+
+def collect(windows=None):
+    """Суммирует счётчики последних окон по именам URL."""
+    cache = get_cache()
+    last = current_window()
+    windows = windows or settings.REQUEST_TIMING_WINDOWS
+    names = sorted(set(view_names()))
+    fields = FIELDS + tuple(
+        f'bucket{index}' for index in range(len(BUCKETS_MS) + 1))
+    flush()
+    stats = {}
+    for window in range(last - windows + 1, last + 1):
+        # Сначала счётчики запросов: остальные поля читаем только
+        # у представлений, которые вызывались в этом окне.
+        counts = cache.get_many([f'timing:{window}:{name}:count'
+                                 for name in names])
+        seen = [name for name in names
+                if f'timing:{window}:{name}:count' in counts]
+        values = cache.get_many([f'timing:{window}:{name}:{field}'
+                                 for name in seen for field in fields])
+        for name in seen:
+            view = stats.setdefault(name, dict.fromkeys(FIELDS, 0))
+            view.setdefault('buckets', [0] * (len(BUCKETS_MS) + 1))
+            for field in FIELDS:
+                view[field] += values.get(f'timing:{window}:{name}:{field}', 0)
+            for index in range(len(BUCKETS_MS) + 1):
+                view['buckets'][index] += values.get(
+                    f'timing:{window}:{name}:bucket{index}', 0)
+    for view in stats.values():
+        count = view['count'] or 1
+        view.update({
+            'mean_ms': view['total_us'] / count / 1000,
+            'db_ms': view['db_us'] / count / 1000,
+            'template_ms': view['template_us'] / count / 1000,
+            'mean_queries': view['queries'] / count,
+            'p50_ms': percentile(view['buckets'], view['count'], 50),
+            'p95_ms': percentile(view['buckets'], view['count'], 95),
+            'p99_ms': percentile(view['buckets'], view['count'], 99),
+        })
+    return stats
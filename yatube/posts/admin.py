@@ -1,6 +1,8 @@
 ﻿from django.contrib import admin
 
+from .exporting import export_response
 from .models import Post, Group, Comment, Follow
+from .search import filter_posts
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -15,6 +17,20 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    actions = ('export_csv', 'export_jsonl')
+
+    def export_csv(self, request, queryset):
+        return export_response(queryset, 'csv', 'posts')
+    export_csv.short_description = 'Выгрузить в CSV'
+
+    def export_jsonl(self, request, queryset):
+        return export_response(queryset, 'jsonl', 'posts')
+    export_jsonl.short_description = 'Выгрузить в JSON Lines'
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        return filter_posts(queryset, search_term), False
 
 
 admin.site.register(Post, PostAdmin)
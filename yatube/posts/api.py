@@ -0,0 +1,264 @@
+"""JSON API только для чтения: посты, группы, комментарии, подписки.
+
+?fields=id,text — в ответе и в SQL только эти поля (values(), без
+сборки моделей); ?embed=author,group — вложенные автор и группа вместо
+ключей, тем же JOIN; ?limit= — размер страницы, ссылки next/previous
+несут курсор. Ответы кэшируются под метками изменений тех же
+областей, что и HTML-страницы, и поддерживают условный GET.
+"""
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_safe
+
+from .conditional import cached_page
+from .models import Comment, Follow, Group, Post
+from .paginators import CursorPaginator, InvalidCursor
+from .settings import API_CACHE_TIMEOUT, API_MAX_PAGE_SIZE, API_PAGE_SIZE
+
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'image': 'image',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'comment_count': 'comment_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+FOLLOW_FIELDS = {
+    'id': 'id',
+    'author': 'author__username',
+}
+EMBEDS = {
+    'author': {
+        'id': 'author__id',
+        'username': 'author__username',
+        'first_name': 'author__first_name',
+        'last_name': 'author__last_name',
+    },
+    'group': {
+        'id': 'group__id',
+        'slug': 'group__slug',
+        'title': 'group__title',
+    },
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def json_view(view):
+    """Ошибки запроса и 404 отдаются в JSON, а не страницей сайта."""
+
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return json_response(view(request, *args, **kwargs))
+        except ApiError as error:
+            return json_response({'error': str(error)}, status=error.status)
+        except Http404:
+            return json_response({'error': 'Не найдено'}, status=404)
+
+    return wrapper
+
+
+class Fields:
+    """Поля ответа по ?fields= и ?embed= и колонки для values()."""
+
+    def __init__(self, request, fields, embeds=()):
+        names = [name for name in request.GET.get('fields', '').split(',')
+                 if name] or list(fields)
+        self.embed = [name for name in request.GET.get('embed', '').split(',')
+                      if name]
+        unknown = (set(names) - set(fields)) | (set(self.embed) - set(embeds))
+        if unknown:
+            raise ApiError(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+        self.fields = fields
+        self.embeds = embeds
+        self.names = names + [name for name in self.embed
+                              if name not in names]
+        self.columns = {fields[name] for name in self.names
+                        if name not in self.embed}
+        for name in self.embed:
+            self.columns.update(embeds[name].values())
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def shape(self, row):
+        item = {}
+        for name in self.names:
+            if name in self.embed:
+                nested = {key: row[column]
+                          for key, column in self.embeds[name].items()}
+                item[name] = nested if nested['id'] is not None else None
+            else:
+                item[name] = row[self.fields[name]]
+        if 'image' in item:
+            item['image'] = (default_storage.url(item['image'])
+                             if item['image'] else None)
+        return item
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    if not 1 <= limit <= API_MAX_PAGE_SIZE:
+        raise ApiError(f'limit должен быть от 1 до {API_MAX_PAGE_SIZE}')
+    return limit
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    query = urlencode({**request.GET.dict(), 'cursor': cursor})
+    return f'{request.path}?{query}'
+
+
+def cursor_list(request, queryset, fields, key):
+    """Страница по ключу (дата, id) от новых к старым."""
+    queryset = queryset.values(*fields.columns | set(key)).order_by(
+        *(f'-{field}' for field in key))
+    paginator = CursorPaginator(queryset, get_limit(request), key=key)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise ApiError('Неверный курсор')
+    return {
+        'results': [fields.shape(row) for row in page],
+        'next': page_link(request, page.next_cursor),
+        'previous': page_link(request, page.previous_cursor),
+    }
+
+
+def id_list(request, queryset, fields):
+    """Страница по возрастанию id, курсор — последний отданный id."""
+    limit = get_limit(request)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        if not cursor.isdigit():
+            raise ApiError('Неверный курсор')
+        queryset = queryset.filter(id__gt=cursor)
+    rows = list(queryset.order_by('id').values(
+        *fields.columns | {'id'})[:limit + 1])
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'results': [fields.shape(row) for row in rows],
+        'next': page_link(request, str(rows[-1]['id']) if has_next else None),
+        'previous': None,
+    }
+
+
+def get_row(queryset, fields, **lookup):
+    row = queryset.filter(**lookup).values(*fields.columns).first()
+    if row is None:
+        raise Http404
+    return fields.shape(row)
+
+
+def posts_scopes(request):
+    scopes = []
+    if 'group' in request.GET:
+        scopes.append(f'group:{request.GET["group"]}')
+    if 'author' in request.GET:
+        scopes.append(f'author:{request.GET["author"]}')
+    return scopes or ['index']
+
+
+def post_scopes(request, post_id):
+    return [f'post:{post_id}']
+
+
+def groups_scopes(request, **kwargs):
+    return ['groups']
+
+
+def follows_scopes(request):
+    return [f'follow:{request.user.pk}']
+
+
+def post_queryset(fields):
+    queryset = Post.objects.all()
+    if 'comment_count' in fields:
+        queryset = queryset.with_comment_count()
+    return queryset
+
+
+@cached_page(posts_scopes, API_CACHE_TIMEOUT)
+@json_view
+def posts(request):
+    fields = Fields(request, POST_FIELDS, EMBEDS)
+    queryset = post_queryset(fields)
+    if 'group' in request.GET:
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if 'author' in request.GET:
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return cursor_list(request, queryset, fields, ('pub_date', 'id'))
+
+
+@cached_page(post_scopes, API_CACHE_TIMEOUT)
+@json_view
+def post_detail(request, post_id):
+    fields = Fields(request, POST_FIELDS, EMBEDS)
+    return get_row(post_queryset(fields), fields, pk=post_id)
+
+
+@cached_page(post_scopes, API_CACHE_TIMEOUT)
+@json_view
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    fields = Fields(request, COMMENT_FIELDS, {'author': EMBEDS['author']})
+    return cursor_list(request, Comment.objects.filter(post_id=post_id),
+                       fields, ('created', 'id'))
+
+
+@cached_page(groups_scopes, API_CACHE_TIMEOUT)
+@json_view
+def groups(request):
+    return id_list(request, Group.objects.all(),
+                   Fields(request, GROUP_FIELDS))
+
+
+@cached_page(groups_scopes, API_CACHE_TIMEOUT)
+@json_view
+def group_detail(request, slug):
+    return get_row(Group.objects.all(), Fields(request, GROUP_FIELDS),
+                   slug=slug)
+
+
+@cached_page(follows_scopes, API_CACHE_TIMEOUT, per_user=True)
+@json_view
+def follows(request):
+    """Подписки текущего пользователя."""
+    if not request.user.is_authenticated:
+        raise ApiError('Нужна авторизация', status=401)
+    fields = Fields(request, FOLLOW_FIELDS, {'author': EMBEDS['author']})
+    return id_list(request, Follow.objects.filter(user=request.user), fields)
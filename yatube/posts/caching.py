@@ -0,0 +1,50 @@
+"""Версионированный кэш фрагментов главной страницы и метки изменений.
+
+Номер версии входит в ключ {% cache %}, поэтому любое изменение постов
+сбрасывает все закэшированные страницы разом, без перебора ключей.
+Метки changed:<область> хранят время последнего изменения данных
+страниц области (лента, группа, автор, пост) для условных GET;
+метка SITE_SCOPE входит в каждую и сбрасывает все страницы разом.
+"""
+import time
+
+from django.core.cache import cache
+
+INDEX_VERSION_KEY = 'index_page_version'
+# Область всего сайта: её обновляют массовые изменения (импорт),
+# которые не перечислить по отдельным областям.
+SITE_SCOPE = 'site'
+
+
+def index_cache_version():
+    version = cache.get(INDEX_VERSION_KEY)
+    if version is None:
+        # Начинаем со времени, чтобы после вытеснения ключа не вернуться
+        # к версии, под которой ещё лежат старые фрагменты.
+        cache.add(INDEX_VERSION_KEY, int(time.time()), None)
+        version = cache.get(INDEX_VERSION_KEY)
+    return version
+
+
+def invalidate_index_cache():
+    try:
+        cache.incr(INDEX_VERSION_KEY)
+    except ValueError:
+        index_cache_version()
+
+
+def changed_at(*scopes):
+    """Время последнего изменения данных страниц с областями scopes."""
+    keys = [f'changed:{scope}' for scope in (SITE_SCOPE, *scopes)]
+    stamps = cache.get_many(keys)
+    for key in set(keys) - set(stamps):
+        # Метки нет или её вытеснили: считаем, что изменилось сейчас,
+        # чтобы не отдать 304 на устаревшую страницу.
+        cache.add(key, time.time(), None)
+        stamps[key] = cache.get(key, time.time())
+    return max(stamps.values())
+
+
+def touch(*scopes):
+    now = time.time()
+    cache.set_many({f'changed:{scope}': now for scope in scopes}, None)
@@ -0,0 +1,115 @@
+"""Условные GET для лент и страницы поста.
+
+ETag и Last-Modified считаются по меткам changed_at областей страницы
+и параметрам запроса (номер страницы, курсор) до вызова view, поэтому
+ответ 304 не читает посты из базы и не рендерит шаблоны: автора поста
+страница поста берёт из кэша, в базу идёт только первый запрос к ней.
+Метки обновляют сигналы после фиксации изменений постов, комментариев
+и подписок.
+"""
+import hashlib
+import math
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+from core.replicas import require_fresh
+
+from .caching import changed_at
+from .models import Post
+
+
+def index_scopes(request):
+    return ['index']
+
+
+def group_scopes(request, slug):
+    return [f'group:{slug}']
+
+
+def profile_scopes(request, username):
+    return [f'author:{username}']
+
+
+def post_scopes(request, post_id):
+    # На странице поста есть и число постов автора. Автор поста
+    # не меняется, поэтому его можно кэшировать без срока.
+    author_id = cache.get_or_set(
+        f'post_author:{post_id}',
+        lambda: Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True).first(),
+        None)
+    return [f'post:{post_id}', f'author_id:{author_id}']
+
+
+def follow_scopes(request):
+    return ['index', f'follow:{request.user.pk}']
+
+
+def page_changed_at(request, scopes, **kwargs):
+    """Метка изменения страницы, одна на запрос.
+
+    Если реплика могла ещё не получить изменение, страница строится
+    по основной базе: иначе под новой меткой в кэш и ETag попала бы
+    устаревшая страница.
+    """
+    if not hasattr(request, '_changed_at'):
+        request._changed_at = changed_at(*scopes(request, **kwargs))
+        require_fresh(request._changed_at)
+    return request._changed_at
+
+
+def conditional_page(scopes, per_user=True):
+    """Декоратор view: scopes(request, **kwargs) — области страницы.
+
+    per_user=False — страница одинакова для всех, ETag не учитывает
+    пользователя и не читает сессию.
+    """
+
+    def etag(request, *args, **kwargs):
+        key = ':'.join([
+            request.path,
+            request.GET.urlencode(),
+            str(request.user.pk or 0) if per_user else '',
+            repr(page_changed_at(request, scopes, **kwargs)),
+        ])
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        # Вверх до секунды: изменение в ту же секунду, что и прошлый
+        # ответ, всё равно даст новую дату.
+        return datetime.fromtimestamp(
+            math.ceil(page_changed_at(request, scopes, **kwargs)),
+            timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def cached_page(scopes, timeout, per_user=False):
+    """Декоратор view: ответ 200 кэшируется под меткой изменения scopes.
+
+    Ключ включает адрес с параметрами запроса и, при per_user,
+    пользователя; условный GET работает поверх кэша.
+    """
+
+    def decorator(view):
+        @conditional_page(scopes, per_user=per_user)
+        @wraps(view)
+        def cached(request, *args, **kwargs):
+            key = hashlib.md5(':'.join([
+                request.get_full_path(),
+                str(request.user.pk or 0) if per_user else '',
+                repr(page_changed_at(request, scopes, **kwargs)),
+            ]).encode()).hexdigest()
+            response = cache.get(f'page:{key}')
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(f'page:{key}', response, timeout)
+            return response
+
+        return cached
+
+    return decorator
@@ -0,0 +1,56 @@
+"""Денормализованные счётчики постов и подписок автора.
+
+Счётчики меняются сигналами вместе с постами и подписками; если они
+разошлись с данными (bulk_create, правка в БД), их пересчитывает
+команда recount_author_stats.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import AuthorStats, Follow, Post, User
+
+
+def change_counter(author_id, field, delta):
+    with transaction.atomic():
+        if delta > 0:
+            AuthorStats.objects.get_or_create(author_id=author_id)
+        AuthorStats.objects.filter(
+            author_id=author_id, **{f'{field}__gte': -delta}
+        ).update(**{field: F(field) + delta})
+
+
+def author_stats(author_id):
+    """Счётчики автора; у автора без постов и подписок строки нет."""
+    try:
+        return AuthorStats.objects.get(author_id=author_id)
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(author_id=author_id)
+
+
+def recount():
+    """Пересчитывает счётчики всех авторов, возвращает число исправленных."""
+    posts = dict(
+        Post.objects.order_by().values_list('author').annotate(Count('id')))
+    followers = dict(
+        Follow.objects.values_list('author').annotate(Count('id')))
+    following = dict(Follow.objects.values_list('user').annotate(Count('id')))
+    stats = {
+        row[0]: row[1:] for row in AuthorStats.objects.values_list(
+            'author_id', 'posts_count', 'followers_count', 'following_count')
+    }
+    fixed = 0
+    with transaction.atomic():
+        for author_id in User.objects.values_list('id', flat=True).iterator():
+            counts = (posts.get(author_id, 0), followers.get(author_id, 0),
+                      following.get(author_id, 0))
+            if stats.get(author_id, (0, 0, 0)) == counts:
+                continue
+            AuthorStats.objects.update_or_create(
+                author_id=author_id,
+                defaults=dict(zip(
+                    ('posts_count', 'followers_count', 'following_count'),
+                    counts
+                ))
+            )
+            fixed += 1
+    return fixed
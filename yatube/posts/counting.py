@@ -0,0 +1,170 @@
+"""Приблизительное число строк для больших выборок.
+
+Небольшие выборки считаются точно: COUNT(*) по подзапросу с LIMIT
+порога стоит не дороже подсчёта порога строк. Если строк больше,
+для всей таблицы берётся оценка из статистики базы (sqlite_stat1
+после ANALYZE, reltuples в PostgreSQL, table_rows в MySQL), а для
+выборок с условиями или без статистики — точное число, которое
+считается в фоновом потоке и кэшируется на APPROXIMATE_COUNT_TIMEOUT.
+Сам запрос полный COUNT(*) не выполняет: пока фоновый счёт не готов,
+известно только, что строк больше порога.
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import DatabaseError, connections
+
+from .settings import (APPROXIMATE_COUNT_THRESHOLD, APPROXIMATE_COUNT_TIMEOUT,
+                       APPROXIMATE_COUNT_WORKERS)
+
+logger = logging.getLogger(__name__)
+
+STATISTICS_SQL = {
+    'sqlite': 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s',
+    'postgresql': 'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+    'mysql': 'SELECT table_rows FROM information_schema.tables '
+             'WHERE table_schema = DATABASE() AND table_name = %s',
+}
+ANALYZE_SQL = {
+    'sqlite': 'ANALYZE {}',
+    'postgresql': 'ANALYZE {}',
+    'mysql': 'ANALYZE TABLE {}',
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=APPROXIMATE_COUNT_WORKERS, thread_name_prefix='counts')
+    return _executor
+
+
+def whole_table(queryset):
+    """Выборка — все строки таблицы: без условий, группировки и срезов."""
+    query = queryset.query
+    return not (query.where or query.distinct or query.combinator
+                or query.group_by is not None or query.low_mark
+                or query.high_mark is not None)
+
+
+def table_estimate(queryset):
+    """Число строк таблицы по статистике базы; None, если её нет."""
+    connection = connections[queryset.db]
+    sql = STATISTICS_SQL.get(connection.vendor)
+    if sql is None:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # В SQLite таблицы статистики нет до первого ANALYZE.
+        return None
+    if row is None or row[0] is None:
+        return None
+    value = row[0]
+    if connection.vendor == 'sqlite':
+        # stat начинается с числа строк таблицы.
+        value = value.split()[0]
+    estimate = int(float(value))
+    # PostgreSQL отдаёт -1 для таблицы, которую ещё не анализировали.
+    return estimate if estimate >= 0 else None
+
+
+def count_key(queryset):
+    """Ключ кэша для числа строк выборки; None, если выборка пуста."""
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return None
+    return 'count:' + hashlib.md5(
+        f'{queryset.db}:{sql}:{params!r}'.encode()).hexdigest()
+
+
+def store_count(queryset):
+    """Считает выборку полным COUNT(*) и кэширует: для фона и команд."""
+    key = count_key(queryset)
+    if key is None:
+        return 0
+    try:
+        count = queryset.count()
+        cache.set(key, count, APPROXIMATE_COUNT_TIMEOUT)
+        return count
+    finally:
+        cache.delete(f'{key}:running')
+
+
+def _count_in_background(queryset):
+    try:
+        store_count(queryset)
+    except Exception:
+        logger.exception('Не удалось посчитать строки выборки %s',
+                         queryset.model.__name__)
+    finally:
+        # Соединения с БД у каждого потока свои.
+        connections.close_all()
+
+
+def schedule_count(queryset):
+    """Ставит полный COUNT(*) выборки в фоновый поток, один на ключ."""
+    # Поток пула не видит данных открытой транзакции (тесты,
+    # ATOMIC_REQUESTS), и его счёт был бы неверным.
+    if connections[queryset.db].in_atomic_block:
+        return
+    if cache.add(f'{count_key(queryset)}:running', True,
+                 APPROXIMATE_COUNT_TIMEOUT):
+        # База выбрана здесь: в потоке пула роутер не знает о реплике.
+        get_executor().submit(_count_in_background,
+                              queryset.using(queryset.db))
+
+
+def cached_count(queryset):
+    """Число строк, посчитанное в фоне; None, если его ещё нет."""
+    key = count_key(queryset)
+    if key is None:
+        return 0
+    count = cache.get(key)
+    if count is None:
+        schedule_count(queryset)
+    return count
+
+
+def estimate_count(queryset):
+    """Число строк по статистике или из кэша, без COUNT(*) в запросе.
+
+    None, если оценки пока нет: тогда её считает фоновый поток.
+    """
+    estimate = table_estimate(queryset) if whole_table(queryset) else None
+    return cached_count(queryset) if estimate is None else estimate
+
+
+def approximate_count(queryset, threshold=None):
+    """Число строк и признак точности: до threshold строк считаем точно.
+
+    За порогом — оценка, а пока её нет — threshold + 1.
+    """
+    if threshold is None:
+        threshold = APPROXIMATE_COUNT_THRESHOLD
+    count = queryset.order_by()[:threshold + 1].count()
+    if count <= threshold:
+        return count, True
+    return max(estimate_count(queryset) or 0, count), False
+
+
+def update_statistics(*models, using='default'):
+    """Обновляет статистику базы, по которой оцениваются таблицы."""
+    connection = connections[using]
+    sql = ANALYZE_SQL.get(connection.vendor)
+    if sql is None:
+        return False
+    with connection.cursor() as cursor:
+        for model in models:
+            cursor.execute(sql.format(
+                connection.ops.quote_name(model._meta.db_table)))
+    return True
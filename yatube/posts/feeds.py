@@ -0,0 +1,113 @@
+"""Ленты RSS и Atom: весь сайт, группа и автор.
+
+Готовый ответ лежит в кэше под меткой изменения области ленты (те же
+метки, что у условных GET страниц), поэтому новый или изменённый пост
+сразу даёт новую ленту, а частые опросы читалок обходятся чтением
+кэша или ответом 304.
+"""
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from .conditional import (cached_page, group_scopes, index_scopes,
+                          profile_scopes)
+from .models import Group, Post, User
+from .settings import FEED_CACHE_TIMEOUT, FEED_ITEMS
+
+
+class PostsFeed(Feed):
+    title = 'Yatube: последние посты'
+    description = 'Новые посты всех авторов'
+
+    def link(self, obj=None):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj=None):
+        return self.posts(obj).select_related('author', 'group').order_by(
+            '-pub_date', '-id')[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).words(8)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.id])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else ()
+
+
+class GroupFeed(PostsFeed):
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', args=[obj.slug])
+
+    def posts(self, obj):
+        return obj.posts.all()
+
+
+class AuthorFeed(PostsFeed):
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube: посты {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Новые посты пользователя {obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=[obj.username])
+
+    def posts(self, obj):
+        return obj.posts.all()
+
+
+class AtomPostsFeed(PostsFeed):
+    feed_type = Atom1Feed
+    subtitle = PostsFeed.description
+
+
+class AtomGroupFeed(GroupFeed):
+    feed_type = Atom1Feed
+    subtitle = GroupFeed.description
+
+
+class AtomAuthorFeed(AuthorFeed):
+    feed_type = Atom1Feed
+    subtitle = AuthorFeed.description
+
+
+def cached_feed(feed, scopes):
+    return cached_page(scopes, FEED_CACHE_TIMEOUT)(feed)
+
+
+index_rss = cached_feed(PostsFeed(), index_scopes)
+index_atom = cached_feed(AtomPostsFeed(), index_scopes)
+group_rss = cached_feed(GroupFeed(), group_scopes)
+group_atom = cached_feed(AtomGroupFeed(), group_scopes)
+author_rss = cached_feed(AuthorFeed(), profile_scopes)
+author_atom = cached_feed(AtomAuthorFeed(), profile_scopes)
@@ -0,0 +1,91 @@
+"""Обработка загруженных картинок постов.
+
+Перед сохранением картинка поворачивается по EXIF, уменьшается до
+IMAGE_MAX_SIZE по большей стороне и пересохраняется без метаданных
+в IMAGE_FORMAT. JPEG вместо WebP берётся, только если Pillow собран
+без WebP, от клиента это не зависит: страницы показывают миниатюры
+sorl-thumbnail в JPEG (THUMBNAIL_FORMAT), а сам файл в WebP отдаёт
+лишь JSON API. Картинку, которую не удалось декодировать (битый
+файл, слишком много пикселей), форма отклоняет ошибкой поля.
+Декодирование идёт в отдельном пуле из
+IMAGE_WORKERS потоков: сколько бы фотографий ни загружали разом,
+в памяти распаковано не больше IMAGE_WORKERS кадров. Размеры и вес
+файла записываются в пост, а sorl-thumbnail режет миниатюры уже из
+небольшого файла.
+"""
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+from .settings import (IMAGE_FORMAT, IMAGE_MAX_SIZE, IMAGE_QUALITY,
+                       IMAGE_WORKERS)
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS,
+                                       thread_name_prefix='images')
+    return _executor
+
+
+def output_format():
+    if IMAGE_FORMAT == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return IMAGE_FORMAT
+
+
+def encode(file):
+    """Возвращает обработанную картинку: (ContentFile, ширина, высота).
+
+    ValidationError, если картинку не удалось декодировать.
+    """
+    file.seek(0)
+    try:
+        with Image.open(file) as original:
+            # Для JPEG декодер сразу уменьшает кадр в 2–8 раз.
+            original.draft('RGB', (IMAGE_MAX_SIZE, IMAGE_MAX_SIZE))
+            image = ImageOps.exif_transpose(original)
+            image.thumbnail((IMAGE_MAX_SIZE, IMAGE_MAX_SIZE))
+    except (OSError, Image.DecompressionBombError):
+        # Проверка ImageField не декодирует кадр целиком: обрезанный
+        # файл или «бомба» из миллиардов пикселей ломаются только здесь.
+        raise ValidationError('Не удалось прочитать изображение',
+                              code='invalid_image')
+    image_format = output_format()
+    transparent = ('A' in image.getbands()
+                   or 'transparency' in image.info)
+    if image_format == 'WEBP' and transparent:
+        image = image.convert('RGBA')
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    # Без exif= и icc_profile= метаданные в новый файл не попадают.
+    image.save(buffer, image_format, quality=IMAGE_QUALITY, optimize=True)
+    name = os.path.splitext(os.path.basename(file.name))[0]
+    return (ContentFile(buffer.getvalue(),
+                        name=f'{name}.{EXTENSIONS[image_format]}'),
+            image.width, image.height)
+
+
+def process_image(post):
+    """Заменяет новую картинку поста обработанной до сохранения поста.
+
+    ValidationError из encode() пробрасывается.
+    """
+    if not post.image:
+        post.image_width = post.image_height = post.image_size = None
+        return
+    content, width, height = get_executor().submit(
+        encode, post.image.file).result()
+    post.image = content
+    post.image_width, post.image_height = width, height
+    post.image_size = content.size
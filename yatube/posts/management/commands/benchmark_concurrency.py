@@ -0,0 +1,110 @@
+import asyncio
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test import Client, override_settings
+
+from core.asgi import ASGIHandler
+from posts.management.commands import benchmark_views
+from posts.management.commands.benchmark_views import percentile
+
+
+class Command(BaseCommand):
+    help = ('Замеряет страницы лент под одновременной нагрузкой '
+            'через ASGI-обработчик')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=64,
+                            help='Одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Запросов к каждой странице')
+        parser.add_argument('--threads', type=int,
+                            default=settings.ASGI_THREADS,
+                            help='Потоков представлений (ASGI_THREADS)')
+        parser.add_argument('--query-workers', type=int,
+                            default=settings.QUERY_WORKERS,
+                            help='Потоков запросов (QUERY_WORKERS)')
+        parser.add_argument('--page', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('Нужен хотя бы один клиент и один запрос')
+        targets = benchmark_views.Command().targets(options['page'])
+        self.stdout.write(
+            f'{options["concurrency"]} клиентов, '
+            f'{options["threads"]} потоков представлений, '
+            f'{options["query_workers"]} потоков запросов')
+        # Пул запросов создаётся при первом gather(), уже с этой настройкой.
+        with override_settings(QUERY_WORKERS=options['query_workers']):
+            application = ASGIHandler(get_wsgi_application(),
+                                      options['threads'])
+            try:
+                for name, url, user in targets:
+                    result = asyncio.run(
+                        self.measure(application, url, user, options))
+                    self.report(name, result)
+            finally:
+                application.executor.shutdown()
+
+    async def measure(self, application, url, user, options):
+        path, _, query = url.partition('?')
+        headers = [(b'host', b'testserver')]
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            headers.append((b'cookie', f'{settings.SESSION_COOKIE_NAME}='
+                                       f'{session}'.encode()))
+        scope = {'type': 'http', 'method': 'GET', 'path': path,
+                 'query_string': query.encode(), 'headers': headers,
+                 'http_version': '1.1', 'scheme': 'http',
+                 'server': ('testserver', 80),
+                 'client': ('127.0.0.1', 5000)}
+        remaining = iter(range(options['requests']))
+        latencies = []
+        errors = []
+
+        async def client_loop():
+            for _ in remaining:
+                started = time.perf_counter()
+                status = await self.request(application, scope)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if status != 200:
+                    errors.append(status)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop()
+                               for _ in range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+        if errors:
+            raise CommandError(f'{url} ответил {errors[0]}')
+        return {
+            'rps': len(latencies) / elapsed,
+            'mean_ms': statistics.mean(latencies),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+        }
+
+    async def request(self, application, scope):
+        incoming = [{'type': 'http.request', 'body': b''}]
+        started = {}
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                started['status'] = message['status']
+
+        await application(dict(scope), receive, send)
+        return started['status']
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<14} {result["rps"]:>9.1f} rps  '
+            f'p50 {result["p50_ms"]:>8.2f}  p95 {result["p95_ms"]:>8.2f}  '
+            f'p99 {result["p99_ms"]:>8.2f} мс')
@@ -0,0 +1,88 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.models import Comment, Follow, Post
+from posts.seeding import seed
+from posts.settings import POSTS_PER_PAGE
+from posts.timeline import follow_feed
+
+
+class Command(BaseCommand):
+    help = ('Показывает планы и время запросов лент без составных '
+            'индексов и с ними')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-posts', type=int, default=0,
+                            help='Сначала создать столько постов')
+        parser.add_argument('--seed-users', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['seed_posts']:
+            created = seed(users=options['seed_users'],
+                           posts=options['seed_posts'],
+                           comments=options['seed_posts'] * 2,
+                           follows=options['seed_users'] * 10)
+            self.stdout.write(f'Создано: {created}')
+        queries = self.queries()
+        if not queries:
+            self.stderr.write('Нет данных, запустите с --seed-posts')
+            return
+        with transaction.atomic():
+            self.drop_indexes()
+            before = self.measure(queries, options['repeat'])
+            transaction.set_rollback(True)
+        after = self.measure(queries, options['repeat'])
+        for name in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for title, results in (('без индексов', before),
+                                   ('с индексами', after)):
+                plan, timing = results[name]
+                self.stdout.write(f'  {title}: {timing:.3f} мс')
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+    def queries(self):
+        post = Post.objects.exclude(group=None).order_by('-pub_date').first()
+        follow = Follow.objects.order_by('id').first()
+        if post is None or follow is None:
+            return {}
+        return {
+            'index': lambda: Post.objects.feed()[:POSTS_PER_PAGE],
+            'group_posts': lambda: Post.objects.feed().filter(
+                group_id=post.group_id)[:POSTS_PER_PAGE],
+            'profile': lambda: Post.objects.feed().filter(
+                author_id=post.author_id)[:POSTS_PER_PAGE],
+            'follow_index': lambda: follow_feed(
+                follow.user)[:POSTS_PER_PAGE],
+            'following': lambda: Follow.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id),
+            'comments': lambda: Comment.objects.filter(
+                post_id=post.id).order_by('created')[:POSTS_PER_PAGE],
+        }
+
+    def drop_indexes(self):
+        sql = connection.SchemaEditorClass.sql_delete_index
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for model in (Post, Comment, Follow):
+                for index in model._meta.indexes:
+                    cursor.execute(sql % {
+                        'name': quote(index.name),
+                        'table': quote(model._meta.db_table),
+                    })
+
+    def measure(self, queries, repeat):
+        results = {}
+        for name, make_queryset in queries.items():
+            plan = make_queryset().explain()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(make_queryset())
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = plan, statistics.median(timings)
+        return results
@@ -0,0 +1,133 @@
+import json
+import math
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from core.timing import RequestTimer
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет запросы в секунду, задержки p50/p95/p99 и число '
+            'SQL-запросов страниц лент')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов к каждой странице')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--page', type=int, default=1)
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кэш перед каждым запросом')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument('--compare',
+                            help='JSON прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        results = {
+            'date': timezone.now().isoformat(),
+            'options': {name: options[name] for name in
+                        ('requests', 'warmup', 'page', 'cold')},
+            'data': {model.__name__: model.objects.count()
+                     for model in (User, Group, Post, Comment, Follow)},
+            'views': {},
+        }
+        for name, url, user in self.targets(options['page']):
+            results['views'][name] = self.measure(url, user, options)
+            self.report(name, results['views'][name])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                self.compare(json.load(file), results)
+
+    def targets(self, page):
+        post = Post.objects.annotate(
+            comments_total=Count('comments')
+        ).order_by('-comments_total').first()
+        group = Group.objects.annotate(
+            posts_total=Count('posts')
+        ).order_by('-posts_total').first()
+        author = AuthorStats.objects.order_by('-posts_count').first()
+        reader = AuthorStats.objects.order_by('-following_count').first()
+        if None in (post, group, author, reader):
+            raise CommandError('Нет данных, сначала запустите seed_posts')
+        query = f'?page={page}'
+        return [
+            ('index', reverse('posts:index') + query, None),
+            ('group_posts', reverse('posts:group_list', args=[group.slug])
+             + query, None),
+            ('profile', reverse('posts:profile',
+                                args=[author.author.username]) + query, None),
+            ('post_detail', reverse('posts:post_detail', args=[post.id]),
+             None),
+            ('follow_index', reverse('posts:follow_index') + query,
+             reader.author),
+        ]
+
+    def measure(self, url, user, options):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        for _ in range(options['warmup']):
+            client.get(url)
+        latencies = []
+        queries = []
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            if options['cold']:
+                cache.clear()
+            # Таймер, в отличие от CaptureQueriesContext, видит и запросы
+            # потоков пула core.concurrent.
+            with RequestTimer() as timer:
+                request_started = time.perf_counter()
+                response = client.get(url)
+                latencies.append(
+                    (time.perf_counter() - request_started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url} ответил {response.status_code}')
+            queries.append(timer.queries)
+        elapsed = time.perf_counter() - started
+        return {
+            'url': url,
+            'requests': options['requests'],
+            'rps': round(options['requests'] / elapsed, 2),
+            'mean_ms': round(statistics.mean(latencies), 3),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'queries': max(queries),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<14} {result["rps"]:>9.1f} rps  '
+            f'p50 {result["p50_ms"]:>8.2f}  p95 {result["p95_ms"]:>8.2f}  '
+            f'p99 {result["p99_ms"]:>8.2f} мс  '
+            f'запросов {result["queries"]}')
+
+    def compare(self, before, after):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Сравнение с прогоном {before["date"]}'))
+        for name, result in after['views'].items():
+            old = before['views'].get(name)
+            if old is None:
+                continue
+            changes = ', '.join(
+                f'{key} {old[key]} → {result[key]}'
+                f' ({(result[key] - old[key]) / old[key]:+.0%})'
+                if old[key] else f'{key} {old[key]} → {result[key]}'
+                for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries'))
+            self.stdout.write(f'{name}: {changes}')
@@ -0,0 +1,99 @@
+import multiprocessing
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from posts.management.commands.benchmark_views import percentile
+from posts.models import Comment, Post, User
+
+WRITER = 'benchmark-writer'
+# Настройки стандартного бэкенда для сравнения: журнал DELETE,
+# synchronous=FULL, обычный BEGIN и без повторов.
+BASELINE_OPTIONS = {
+    'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    'transaction_mode': 'DEFERRED',
+    'write_retries': 0,
+}
+
+
+def write(author_id, writes):
+    """Пишет посты и комментарии к ним, возвращает задержки и ошибки."""
+    latencies = []
+    errors = 0
+    for number in range(writes):
+        started = time.perf_counter()
+        try:
+            post = Post.objects.create(
+                text=f'Пост нагрузочного теста {number}',
+                author_id=author_id)
+            Comment.objects.create(post=post, author_id=author_id,
+                                   text='Комментарий нагрузочного теста')
+        except OperationalError:
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+    connection.close()
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = ('Замеряет одновременную запись постов и комментариев '
+            'из нескольких процессов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Процессов-писателей')
+        parser.add_argument('--writes', type=int, default=200,
+                            help='Пост с комментарием на каждого писателя')
+        parser.add_argument('--baseline', action='store_true',
+                            help='Писать с настройками стандартного SQLite')
+        parser.add_argument('--keep', action='store_true',
+                            help='Не удалять созданные посты')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['writes'] < 1:
+            raise CommandError('Нужен хотя бы один писатель и одна запись')
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замер рассчитан на SQLite')
+        author, _ = User.objects.get_or_create(username=WRITER)
+        task = (author.pk, options['writes'])
+        saved_options = connection.settings_dict['OPTIONS']
+        if options['baseline']:
+            # Журнал переключаем, пока соединение одно: смена режима
+            # WAL требует монопольной блокировки.
+            connection.settings_dict['OPTIONS'] = BASELINE_OPTIONS
+            connection.close()
+            connection.ensure_connection()
+        started = time.perf_counter()
+        try:
+            results = self.run(task, options['workers'])
+        finally:
+            elapsed = time.perf_counter() - started
+            connection.settings_dict['OPTIONS'] = saved_options
+            connection.close()
+        latencies = [value for values, _ in results for value in values]
+        errors = sum(errors for _, errors in results)
+        self.stdout.write(
+            f'{options["workers"]} писателей, {len(latencies)} записей, '
+            f'ошибок {errors}, {len(latencies) / elapsed:.1f} записей/с')
+        if latencies:
+            self.stdout.write(
+                f'p50 {percentile(latencies, 50):.2f}  '
+                f'p95 {percentile(latencies, 95):.2f}  '
+                f'p99 {percentile(latencies, 99):.2f}  '
+                f'max {max(latencies):.2f}  '
+                f'mean {statistics.mean(latencies):.2f} мс')
+        if not options['keep']:
+            # Комментарии удаляем первыми: каскад от поста к ним не настроен.
+            Comment.objects.filter(author=author).delete()
+            author.delete()
+
+    def run(self, task, workers):
+        if workers == 1:
+            return [write(*task)]
+        # Дочерние процессы наследуют настройки и откроют свои соединения.
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            return pool.starmap(write, [task] * workers)
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import MediaBlob, Post
+
+
+class Command(BaseCommand):
+    help = ('Удаляет файлы картинок и их миниатюры, на которые не '
+            'ссылается ни один пост')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=60,
+            help='Не трогать файлы, которые менялись позже, минут назад')
+        parser.add_argument('--recount', action='store_true',
+                            help='Сначала пересчитать ссылки по постам')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.stdout.write(f'Исправлено ссылок: {self.recount()}')
+        storage = Post._meta.get_field('image').storage
+        cutoff = timezone.now() - timedelta(minutes=options['grace'])
+        removed = freed = 0
+        for blob in MediaBlob.objects.filter(
+                refs__lte=0, updated__lt=cutoff).iterator():
+            if options['dry_run']:
+                self.stdout.write(blob.name)
+            elif not self.remove(blob, storage, cutoff):
+                continue
+            removed += 1
+            freed += blob.size or 0
+        self.stdout.write(
+            f'Удалено файлов: {removed}, освобождено {freed} байт')
+
+    def remove(self, blob, storage, cutoff):
+        # Строку удаляем с теми же условиями: если файл только что
+        # загрузили снова, updated сдвинулся и файл остаётся.
+        if not MediaBlob.objects.filter(
+                pk=blob.pk, refs__lte=0, updated__lt=cutoff).delete()[0]:
+            return False
+        # Загрузка сразу после удаления строки создаёт её заново,
+        # и файл снова нужен.
+        if MediaBlob.objects.filter(name=blob.name).exists():
+            return False
+        delete(ImageFile(blob.name, storage))
+        return True
+
+    def recount(self):
+        refs = dict(Post.objects.exclude(image='').order_by().values_list(
+            'image').annotate(Count('id')))
+        fixed = 0
+        for blob in MediaBlob.objects.iterator():
+            count = refs.pop(blob.name, 0)
+            if blob.refs != count:
+                blob.refs = count
+                blob.save(update_fields=['refs', 'updated'])
+                fixed += 1
+        MediaBlob.objects.bulk_create(
+            MediaBlob(name=name, refs=count) for name, count in refs.items())
+        return fixed + len(refs)
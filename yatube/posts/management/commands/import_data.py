@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts.importing import KINDS, Importer
+
+
+class Command(BaseCommand):
+    help = ('Импортирует пользователей, группы, посты, комментарии и '
+            'подписки из CSV или JSON Lines')
+
+    def add_arguments(self, parser):
+        for kind in KINDS:
+            parser.add_argument(f'--{kind}', metavar='FILE',
+                                help='Файл .csv или .jsonl')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Строк в одной транзакции')
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='Не пересчитывать счётчики, ленты и '
+                                 'поисковый индекс')
+
+    def handle(self, *args, **options):
+        importer = Importer(options['batch_size'], log=self.stdout.write)
+        importer.run({kind: options[kind] for kind in KINDS})
+        if not options['no_rebuild']:
+            importer.rebuild()
+            self.stdout.write('Счётчики, ленты и индекс пересчитаны')
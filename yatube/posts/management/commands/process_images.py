@@ -0,0 +1,38 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from posts.images import process_image
+from posts.models import Post
+from posts.thumbnails import schedule_thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Пересохраняет картинки старых постов: уменьшает, убирает '
+            'метаданные и записывает размеры')
+
+    def handle(self, *args, **options):
+        processed = saved = 0
+        posts = Post.objects.filter(image_size__isnull=True).exclude(
+            image='').only('image').order_by('pk')
+        for post in posts.iterator():
+            storage = post.image.storage
+            if not storage.exists(post.image.name):
+                self.stderr.write(
+                    f'Пост {post.pk}: нет файла {post.image.name}')
+                continue
+            before = storage.size(post.image.name)
+            try:
+                with post.image.open('rb'):
+                    process_image(post)
+            except ValidationError:
+                self.stderr.write(
+                    f'Пост {post.pk}: не удалось прочитать {post.image.name}')
+                continue
+            post.save(update_fields=[
+                'image', 'image_width', 'image_height', 'image_size'])
+            schedule_thumbnails(post)
+            processed += 1
+            saved += before - post.image_size
+        # Исходные файлы остаются без ссылок, их удалит gc_media.
+        self.stdout.write(
+            f'Обработано картинок: {processed}, сэкономлено {saved} байт')
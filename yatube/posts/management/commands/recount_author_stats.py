@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов и подписок авторов'
+
+    def handle(self, *args, **options):
+        fixed = recount()
+        self.stdout.write(f'Исправлено счётчиков: {fixed}')
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts.seeding import seed
+
+
+class Command(BaseCommand):
+    help = 'Наполняет базу синтетическими пользователями, постами и подписками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней разбросать даты постов')
+        parser.add_argument('--random-seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        created = seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            days=options['days'],
+            random_seed=options['random_seed'],
+        )
+        for name, count in created.items():
+            self.stdout.write(f'{name}: {count}')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.counting import update_statistics
+from posts.models import Comment, Follow, Post
+
+
+class Command(BaseCommand):
+    help = ('Обновляет статистику базы, по которой оценивается число '
+            'постов, комментариев и подписок')
+
+    def handle(self, *args, **options):
+        if update_statistics(Post, Comment, Follow):
+            self.stdout.write('Статистика обновлена')
+        else:
+            self.stdout.write('База не ведёт статистику таблиц')
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    posts = dict(
+        Post.objects.order_by().values_list('author').annotate(Count('id')))
+    followers = dict(
+        Follow.objects.values_list('author').annotate(Count('id')))
+    following = dict(Follow.objects.values_list('user').annotate(Count('id')))
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(author_id=author_id,
+                     posts_count=posts.get(author_id, 0),
+                     followers_count=followers.get(author_id, 0),
+                     following_count=following.get(author_id, 0))
+         for author_id in User.objects.values_list('id', flat=True)
+         if author_id in posts or author_id in followers
+         or author_id in following],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0009_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики автора',
+                'verbose_name_plural': 'Счётчики авторов',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:32
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def fill_blobs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaBlob = apps.get_model('posts', 'MediaBlob')
+    refs = Post.objects.exclude(image='').order_by().values_list(
+        'image').annotate(Count('id'))
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=name, refs=count) for name, count in refs],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveIntegerField(blank=True, null=True)),
+                ('refs', models.IntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.AddIndex(
+            model_name='mediablob',
+            index=models.Index(fields=['refs', 'updated'], name='mediablob_refs_updated_idx'),
+        ),
+        migrations.RunPython(fill_blobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_media_blobs'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='mediablob',
+            options={'verbose_name': 'Файл картинки', 'verbose_name_plural': 'Файлы картинок'},
+        ),
+        migrations.AlterField(
+            model_name='mediablob',
+            name='name',
+            field=models.CharField(max_length=255, unique=True, verbose_name='Файл'),
+        ),
+        migrations.AlterField(
+            model_name='mediablob',
+            name='refs',
+            field=models.IntegerField(default=0, verbose_name='Ссылок из постов'),
+        ),
+        migrations.AlterField(
+            model_name='mediablob',
+            name='size',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Размер, байт'),
+        ),
+        migrations.AlterField(
+            model_name='mediablob',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменён'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+# FANOUT_FOLLOWERS_LIMIT на момент миграции.
+FANOUT_FOLLOWERS_LIMIT = 1000
+
+
+def mark_heavy_authors(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    AuthorStats.objects.filter(
+        followers_count__gt=FANOUT_FOLLOWERS_LIMIT).update(fanned_out=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_mediablob_verbose_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='fanned_out',
+            field=models.BooleanField(default=True, verbose_name='Посты раскладываются по лентам'),
+        ),
+        migrations.RunPython(mark_heavy_authors, migrations.RunPython.noop),
+    ]
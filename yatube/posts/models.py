@@ -1,8 +1,12 @@
 # Create your models here.
 
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 
+from .counting import approximate_count
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -19,6 +23,39 @@ class Group(models.Model):
         return self.title
 
 
+class CountingQuerySet(models.QuerySet):
+    def approximate_count(self, threshold=None):
+        """Точное число строк до threshold, дальше — оценка.
+
+        Возвращает пару (число, точное ли оно).
+        """
+        return approximate_count(self, threshold)
+
+
+class PostQuerySet(CountingQuerySet):
+    def with_comment_count(self):
+        """Число комментариев подзапросом, а не JOIN + GROUP BY.
+
+        Группировка заставляла сортировать всю выборку и не давала
+        использовать индексы по дате.
+        """
+        comments = Comment.objects.filter(
+            post=models.OuterRef('pk')
+        ).order_by().values('post').annotate(
+            count=models.Count('id')
+        ).values('count')
+        return self.annotate(
+            comment_count=Coalesce(models.Subquery(
+                comments, output_field=models.IntegerField()), 0))
+
+    def feed(self):
+        """Посты для лент: автор и группа одним запросом, только нужное."""
+        return self.select_related('author', 'group').only(
+            'text', 'pub_date', 'image',
+            'author__username', 'group__slug', 'group__title',
+        ).with_comment_count().order_by('-pub_date', '-id')
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст поста')
     pub_date = models.DateTimeField(
@@ -43,11 +80,28 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False)
+    image_size = models.PositiveIntegerField(
+        'Размер картинки, байт', null=True, blank=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date'),
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['group', '-pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_pub_date_idx'),
+        ]
         verbose_name = 'Пост',
         verbose_name_plural = 'Посты'
 
@@ -74,8 +128,12 @@ class Comment(models.Model):
         verbose_name='Дата комментария'
     )
 
+    objects = CountingQuerySet.as_manager()
+
     class Meta:
         ordering = ('-created'),
+        indexes = [models.Index(fields=['post', 'created'],
+                   name='comment_post_created_idx')]
         verbose_name = 'Комментарий',
         verbose_name_plural = 'Комментарии'
 
@@ -94,8 +152,117 @@ class Follow(models.Model):
         verbose_name='Автор'
     )
 
+    objects = CountingQuerySet.as_manager()
+
     class Meta:
         constraints = [models.UniqueConstraint(fields=['author',
                        'user'], name='unique_link')]
+        indexes = [models.Index(fields=['user', 'author'],
+                   name='follow_user_author_idx')]
         verbose_name = 'Подписка',
         verbose_name_plural = 'Подписки'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        constraints = [models.UniqueConstraint(fields=['user', 'post'],
+                       name='unique_feed_entry')]
+        indexes = [models.Index(fields=['user', '-pub_date'],
+                   name='feed_user_pub_date_idx')]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+
+class AuthorStats(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок'
+    )
+    fanned_out = models.BooleanField(
+        default=True,
+        verbose_name='Посты раскладываются по лентам'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+
+class SearchTerm(models.Model):
+    term = models.CharField(max_length=100, verbose_name='Слово')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Пост'
+    )
+    count = models.PositiveIntegerField(verbose_name='Вхождений')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['term', 'post'],
+                       name='unique_search_term')]
+        verbose_name = 'Слово поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+
+
+class MediaBlob(models.Model):
+    """Файл картинки и число постов, которые на него ссылаются."""
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Файл'
+    )
+    size = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Размер, байт'
+    )
+    refs = models.IntegerField(
+        default=0,
+        verbose_name='Ссылок из постов'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменён'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['refs', 'updated'],
+                         name='mediablob_refs_updated_idx'),
+        ]
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name} ({self.refs})'
@@ -0,0 +1,249 @@
+import base64
+import binascii
+import json
+from math import ceil
+
+from django.core.paginator import (EmptyPage, InvalidPage, Page,
+                                   PageNotAnInteger, Paginator)
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .counting import estimate_count
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class ElidedPage(Page):
+    """Страница без общего числа строк: о следующей знает по лишней строке."""
+
+    def __init__(self, object_list, number, paginator, next_exists):
+        super().__init__(object_list, number, paginator)
+        self.next_exists = next_exists
+
+    def has_next(self):
+        return self.next_exists
+
+    def end_index(self):
+        return self.start_index() + len(self) - 1
+
+
+class ElidedPaginator(Paginator):
+    """Номера страниц окном вокруг текущей вместо всего page_range.
+
+    Строки считаются не дальше count_limit: COUNT(*) по подзапросу
+    с LIMIT стоит одинаково на ленте из тысячи и из миллиона постов.
+    Если строк больше, count_exact ложно, последняя страница неизвестна,
+    а есть ли следующая, страница узнаёт по одной лишней строке;
+    estimated_pages тогда — оценка по статистике базы или посчитанному
+    в фоне числу, а пока его нет — нижняя граница.
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count_limit=None,
+                 on_each_side=3, on_ends=1, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_limit = count_limit
+        self.on_each_side = on_each_side
+        self.on_ends = on_ends
+
+    def count_objects(self):
+        return self.object_list
+
+    @cached_property
+    def count(self):
+        objects = self.count_objects()
+        if self.count_limit is not None:
+            objects = objects[:self.count_limit + 1]
+        return objects.count()
+
+    @cached_property
+    def count_exact(self):
+        return self.count_limit is None or self.count <= self.count_limit
+
+    @cached_property
+    def num_pages(self):
+        return super().num_pages if self.count_exact else None
+
+    @cached_property
+    def estimated_count(self):
+        """Оценка числа строк за лимитом; None, пока её не посчитали."""
+        if self.count_exact:
+            return self.count
+        estimate = estimate_count(self.count_objects())
+        return None if estimate is None else max(estimate, self.count)
+
+    @cached_property
+    def estimated_pages(self):
+        """Оценка числа страниц, когда точный счёт остановился на лимите.
+
+        Без оценки — страницы до лимита, шаблон дописывает «+».
+        """
+        if self.count_exact:
+            return self.num_pages
+        return ceil((self.estimated_count or self.count) / self.per_page)
+
+    def validate_number(self, number):
+        if self.count_exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы — не целое число')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        if self.count_exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not objects and number > 1:
+            raise EmptyPage('На странице нет результатов')
+        return ElidedPage(objects[:self.per_page], number, self,
+                          next_exists=len(objects) > self.per_page)
+
+    def get_page(self, number):
+        if self.count_exact:
+            return super().get_page(number)
+        try:
+            return self.page(number)
+        except InvalidPage:
+            return self.page(1)
+
+    def get_elided_page_range(self, page):
+        """Номера страниц для навигации, пропуски — ELLIPSIS.
+
+        По краям on_ends страниц, вокруг текущей — on_each_side.
+        """
+        number, around, ends = page.number, self.on_each_side, self.on_ends
+        if self.count_exact:
+            last = self.num_pages
+        else:
+            # Показываем только страницы, которые точно есть.
+            last = max(ceil(self.count / self.per_page),
+                       number + page.has_next())
+        if number > around + ends + 2:
+            yield from range(1, ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - around, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if not self.count_exact:
+            yield from range(number + 1, min(number + around, last) + 1)
+            if page.has_next():
+                yield self.ELLIPSIS
+        elif number < last - around - ends - 1:
+            yield from range(number + 1, number + around + 1)
+            yield self.ELLIPSIS
+            yield from range(last - ends + 1, last + 1)
+        else:
+            yield from range(number + 1, last + 1)
+
+
+class FeedPaginator(ElidedPaginator):
+    """Считает строки ленты без её аннотаций и подзапросов."""
+
+    def count_objects(self):
+        return self.object_list.values('pk')
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации: знает только соседей, без номеров."""
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (дата, id) от новых к старым.
+
+    Каждая страница — один запрос «WHERE ключ < курсор LIMIT n + 1»,
+    без COUNT(*) и OFFSET, поэтому глубокие страницы не дороже первой.
+    Первое поле ключа — дата, второе — первичный ключ.
+    """
+    cursor_based = True
+
+    def __init__(self, object_list, per_page, key=('pub_date', 'id')):
+        super().__init__(object_list, per_page)
+        self.key = key
+
+    @staticmethod
+    def encode_cursor(values, reverse=False):
+        date, pk = values
+        data = json.dumps([date.isoformat(), pk, int(reverse)])
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            date, pk, reverse = json.loads(data.decode())
+            date = parse_datetime(date)
+            if date is None:
+                raise ValueError
+            return (date, int(pk)), bool(reverse)
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+
+    def _key_values(self, obj):
+        if isinstance(obj, dict):
+            return tuple(obj[field] for field in self.key)
+        return tuple(getattr(obj, field) for field in self.key)
+
+    def _slice(self, values, reverse):
+        date_field, pk_field = self.key
+        lookup = 'gt' if reverse else 'lt'
+        order = '' if reverse else '-'
+        queryset = self.object_list.order_by(
+            f'{order}{date_field}', f'{order}{pk_field}')
+        if values is not None:
+            date, pk = values
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__{lookup}': date})
+                | Q(**{date_field: date, f'{pk_field}__{lookup}': pk})
+            )
+        return list(queryset[:self.per_page + 1])
+
+    def page(self, cursor):
+        """Возвращает страницу по курсору, пустой курсор — первая страница."""
+        values, reverse = (
+            self.decode_cursor(cursor) if cursor else (None, False))
+        objects = self._slice(values, reverse)
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if reverse:
+            objects.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        next_cursor = previous_cursor = None
+        if objects and has_next:
+            next_cursor = self.encode_cursor(self._key_values(objects[-1]))
+        if objects and has_previous:
+            previous_cursor = self.encode_cursor(
+                self._key_values(objects[0]), reverse=True)
+        return CursorPage(objects, self, next_cursor, previous_cursor)
+
+    def get_page(self, cursor):
+        """Как Paginator.get_page: битый курсор отдаёт первую страницу."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
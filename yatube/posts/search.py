@@ -0,0 +1,157 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite со сборкой FTS5 посты индексируются в виртуальной таблице
+posts_post_fts (rowid = id поста, ранжирование bm25). На остальных
+базах работает обратный индекс в таблице SearchTerm: слово, пост
+и число вхождений, ранжирование по tf-idf. Индекс обновляется
+сигналами при сохранении и удалении поста.
+"""
+import math
+import re
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+
+from .models import Post, SearchTerm
+from .settings import SEARCH_BACKEND
+
+FTS_TABLE = 'posts_post_fts'
+TOKEN_RE = re.compile(r'\w+')
+
+_backend = None
+
+
+def tokenize(text):
+    return [token[:100] for token in TOKEN_RE.findall(text.casefold())]
+
+
+class Fts5Backend:
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {FTS_TABLE}(rowid, text) '
+                'VALUES (%s, %s)', [post.id, post.text])
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    @staticmethod
+    def match(terms):
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def count(self, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [self.match(terms)])
+            return cursor.fetchone()[0]
+
+    def ids(self, terms, start, stop):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                [self.match(terms), stop - start, start])
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, terms):
+        return queryset.extra(
+            where=[f'{Post._meta.db_table}.id IN (SELECT rowid FROM '
+                   f'{FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'],
+            params=[self.match(terms)])
+
+
+class PythonBackend:
+
+    def index(self, post):
+        counts = Counter(tokenize(post.text))
+        with transaction.atomic():
+            SearchTerm.objects.filter(post=post).delete()
+            SearchTerm.objects.bulk_create(
+                SearchTerm(term=term, post=post, count=count)
+                for term, count in counts.items())
+
+    def remove(self, post_id):
+        SearchTerm.objects.filter(post_id=post_id).delete()
+
+    def clear(self):
+        SearchTerm.objects.all().delete()
+
+    def matches(self, terms):
+        terms = set(terms)
+        return SearchTerm.objects.filter(term__in=terms).values(
+            'post').annotate(found=Count('term')).filter(found=len(terms))
+
+    def count(self, terms):
+        return self.matches(terms).count()
+
+    def ids(self, terms, start, stop):
+        frequencies = dict(SearchTerm.objects.filter(
+            term__in=set(terms)).values_list('term').annotate(Count('post')))
+        total = Post.objects.count()
+        score = Sum(Case(
+            *(When(term=term, then=F('count') * Value(
+                math.log(1 + total / frequency)))
+              for term, frequency in frequencies.items()),
+            default=Value(0.0),
+            output_field=FloatField()
+        ))
+        return list(self.matches(terms).annotate(score=score).order_by(
+            '-score', '-post').values_list('post', flat=True)[start:stop])
+
+    def filter(self, queryset, terms):
+        return queryset.filter(pk__in=self.matches(terms).values('post'))
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        use_fts = (SEARCH_BACKEND == 'fts5'
+                   or SEARCH_BACKEND == 'auto'
+                   and FTS_TABLE in connection.introspection.table_names())
+        _backend = Fts5Backend() if use_fts else PythonBackend()
+    return _backend
+
+
+def filter_posts(queryset, query):
+    """Оставляет в queryset только посты, подходящие под запрос."""
+    terms = tokenize(query)
+    if not terms:
+        return queryset.none()
+    return get_backend().filter(queryset, terms)
+
+
+def rebuild_index():
+    backend = get_backend()
+    with transaction.atomic():
+        backend.clear()
+        for post in Post.objects.order_by().only('text').iterator():
+            backend.index(post)
+
+
+class SearchResults:
+    """Результаты поиска для Paginator: посты в порядке релевантности."""
+
+    def __init__(self, query, backend=None):
+        self.terms = tokenize(query)
+        self.backend = backend or get_backend()
+
+    def count(self):
+        return self.backend.count(self.terms) if self.terms else 0
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.terms:
+            return []
+        ids = self.backend.ids(self.terms, index.start or 0, index.stop)
+        posts = Post.objects.feed().in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
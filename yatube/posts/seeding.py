@@ -0,0 +1,106 @@
+"""Наполнение базы синтетическими данными для замеров.
+
+Используется командой seed_posts и флагом --seed-posts команды
+benchmark_feed_indexes. Всё создаётся через bulk_create, сигналы при
+этом не срабатывают, поэтому в конце пересчитываются счётчики и ленты
+подписок.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters, timeline
+from .models import Comment, Follow, Group, Post, User
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Разрешает задавать даты полям с auto_now_add."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in saved:
+            field.auto_now_add = auto_now_add
+
+
+def _batches(objects, batch_size):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(users=100, groups=10, posts=10000, comments=20000, follows=1000,
+         days=365, batch_size=1000, random_seed=0):
+    """Создаёт данные и возвращает словарь с числом созданных строк."""
+    rnd = random.Random(random_seed)
+    now = timezone.now()
+    prefix = f'seed{User.objects.count()}_'
+
+    def random_date():
+        return now - timedelta(seconds=rnd.randrange(days * 24 * 60 * 60))
+
+    with transaction.atomic():
+        for batch in _batches(
+                (User(username=f'{prefix}{i}') for i in range(users)),
+                batch_size):
+            User.objects.bulk_create(batch)
+        user_ids = list(User.objects.filter(
+            username__startswith=prefix).values_list('id', flat=True))
+        for batch in _batches(
+                (Group(title=f'Группа {prefix}{i}',
+                       slug=f'{prefix}{i}'.lower(), description='')
+                 for i in range(groups)), batch_size):
+            Group.objects.bulk_create(batch)
+        group_ids = list(Group.objects.filter(
+            slug__startswith=prefix.lower()).values_list('id', flat=True))
+        pairs = set()
+        for _ in range(min(follows, len(user_ids) * (len(user_ids) - 1))):
+            while True:
+                user_id, author_id = rnd.sample(user_ids, 2)
+                if (user_id, author_id) not in pairs:
+                    pairs.add((user_id, author_id))
+                    break
+        for batch in _batches(
+                (Follow(user_id=user_id, author_id=author_id)
+                 for user_id, author_id in pairs), batch_size):
+            Follow.objects.bulk_create(batch)
+        with explicit_dates(Post._meta.get_field('pub_date'),
+                            Comment._meta.get_field('created')):
+            for batch in _batches(
+                    (Post(text=f'Пост {i}', author_id=rnd.choice(user_ids),
+                          group_id=(rnd.choice(group_ids)
+                                    if group_ids and rnd.random() < 0.7
+                                    else None),
+                          pub_date=random_date())
+                     for i in range(posts)), batch_size):
+                Post.objects.bulk_create(batch)
+            post_ids = list(Post.objects.filter(
+                author__username__startswith=prefix
+            ).values_list('id', flat=True))
+            for batch in _batches(
+                    (Comment(post_id=rnd.choice(post_ids),
+                             author_id=rnd.choice(user_ids),
+                             text=f'Комментарий {i}', created=random_date())
+                     for i in range(comments if post_ids else 0)),
+                    batch_size):
+                Comment.objects.bulk_create(batch)
+        counters.recount()
+        timeline.rebuild(User.objects.filter(username__startswith=prefix))
+    return {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'follows': len(pairs),
+        'posts': len(post_ids),
+        'comments': comments if post_ids else 0,
+    }
@@ -1 +1,56 @@
 POSTS_PER_PAGE = 10
+# Номеров страниц по обе стороны от текущей в навигации ленты.
+PAGE_WINDOW = 3
+# Строк ленты, дальше которых COUNT(*) не считает: у более длинных лент
+# навигация показывает только соседние страницы, без последней.
+PAGINATOR_COUNT_LIMIT = 10000
+# До стольких строк approximate_count() считает точно, дальше берёт
+# статистику базы или закэшированное на указанное время число, которое
+# считают APPROXIMATE_COUNT_WORKERS фоновых потоков.
+APPROXIMATE_COUNT_THRESHOLD = 10000
+APPROXIMATE_COUNT_TIMEOUT = 60 * 10
+APPROXIMATE_COUNT_WORKERS = 1
+# Курсорная пагинация лент (?cursor=) вместо номеров страниц по умолчанию.
+CURSOR_PAGINATION = False
+# Авторы с большим числом подписчиков не раскладываются по лентам
+# при публикации, их посты подмешиваются в ленту при чтении.
+FANOUT_FOLLOWERS_LIMIT = 1000
+# Раскладка возобновляется, только когда подписчиков становится
+# не больше стольких: подписка и отписка у порога не перекладывают
+# ленты раз за разом. Посты дописывают FANOUT_WORKERS фоновых потоков.
+FANOUT_FOLLOWERS_RESUME = 800
+FANOUT_WORKERS = 1
+# Записей ленты в одном INSERT; под лимит переменных SQLite Django
+# сам делит пачку на части.
+FANOUT_BATCH_SIZE = 500
+# Время жизни кэша главной страницы, сбрасывается при изменении постов.
+INDEX_CACHE_TIMEOUT = 60 * 60
+# Размеры миниатюр, которые готовятся в фоне после загрузки картинки;
+# должны совпадать с тегами {% thumbnail %} в шаблонах постов.
+THUMBNAIL_SIZES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+THUMBNAIL_WORKERS = 2
+# Поиск: 'fts5' — полнотекстовый индекс SQLite, 'python' — собственный
+# обратный индекс в таблице SearchTerm, 'auto' — FTS5, если он доступен.
+SEARCH_BACKEND = 'auto'
+COMMENTS_PER_PAGE = 20
+# Сколько строк читать из базы за раз при выгрузке постов.
+EXPORT_CHUNK_SIZE = 2000
+# Лента RSS/Atom: число записей и время жизни в кэше; кэш сбрасывается
+# и раньше, при изменении постов ленты.
+FEED_ITEMS = 20
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+# JSON API: объектов на странице по умолчанию и наибольшее по ?limit=,
+# время жизни ответов в кэше (сбрасываются и раньше, метками изменений).
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_CACHE_TIMEOUT = 60 * 10
+# Загруженные картинки уменьшаются до IMAGE_MAX_SIZE по большей стороне
+# и пересохраняются без метаданных в IMAGE_FORMAT (JPEG, только если
+# Pillow собран без WebP; миниатюры на страницах — всегда JPEG);
+# одновременно обрабатывается IMAGE_WORKERS картинок.
+IMAGE_MAX_SIZE = 1920
+IMAGE_FORMAT = 'WEBP'
+IMAGE_QUALITY = 80
+IMAGE_WORKERS = 2
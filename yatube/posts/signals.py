@@ -0,0 +1,137 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import timeline
+from .caching import SITE_SCOPE, invalidate_index_cache, touch
+from .counters import change_counter
+from .models import Comment, Follow, Group, Post
+from .search import get_backend
+from .storage import change_refs
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        change_counter(instance.author_id, 'posts_count', 1)
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_counter(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_index(sender, **kwargs):
+    # После фиксации: иначе главная, запрошенная до неё, закэширует
+    # фрагменты со старыми данными под новой версией.
+    transaction.on_commit(invalidate_index_cache)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    get_backend().remove(instance.id)
+
+
+@receiver(post_save, sender=Post)
+def count_image_refs(sender, instance, created, **kwargs):
+    previous = None if created else getattr(instance, '_previous_image', None)
+    if instance.image.name != previous:
+        change_refs(previous, -1)
+        change_refs(instance.image.name, 1)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    change_refs(instance.image.name, -1)
+
+
+@receiver(post_save, sender=Follow)
+def fill_feed_on_follow(sender, instance, created, **kwargs):
+    if not created:
+        return
+    change_counter(instance.author_id, 'followers_count', 1)
+    change_counter(instance.user_id, 'following_count', 1)
+    timeline.add_follower(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_feed_on_unfollow(sender, instance, **kwargs):
+    change_counter(instance.author_id, 'followers_count', -1)
+    change_counter(instance.user_id, 'following_count', -1)
+    timeline.remove_author(instance.user_id, instance.author_id)
+
+
+def touch_after_commit(*scopes):
+    """Метки — после фиксации: иначе страницу, построенную до неё
+    по старым данным, закэшируют и отдадут в ETag под новой меткой."""
+    transaction.on_commit(lambda: touch(*scopes))
+
+
+def post_page_scopes(post):
+    scopes = ['index', f'post:{post.id}', f'author:{post.author.username}',
+              f'author_id:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group.slug}')
+    return scopes
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_group_slug, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group__slug', 'image').first() or (None, None))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def touch_post_pages(sender, instance, **kwargs):
+    scopes = post_page_scopes(instance)
+    previous_group_slug = getattr(instance, '_previous_group_slug', None)
+    if previous_group_slug:
+        scopes.append(f'group:{previous_group_slug}')
+    touch_after_commit(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+def touch_comment_pages(sender, instance, **kwargs):
+    # Число комментариев есть в закэшированных фрагментах главной.
+    transaction.on_commit(invalidate_index_cache)
+    touch_after_commit(*post_page_scopes(instance.post))
+
+
+@receiver(post_delete, sender=Comment)
+def touch_deleted_comment_pages(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_index_cache)
+    # Без обращения к посту: при удалении поста комментарии удаляются
+    # каскадом, и запрос на каждый из них был бы слишком дорог.
+    touch_after_commit('index', f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def touch_follow_pages(sender, instance, **kwargs):
+    touch_after_commit(
+        f'author:{instance.author.username}',
+        f'author:{instance.user.username}', f'author_id:{instance.author_id}',
+        f'author_id:{instance.user_id}', f'follow:{instance.user_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def touch_group_pages(sender, instance, created=False, **kwargs):
+    scopes = ['groups', f'group:{instance.slug}']
+    if not created:
+        # Название и адрес группы есть у её постов на главной, в профилях
+        # и на страницах постов; группы меняют редко, сбрасываем всё.
+        transaction.on_commit(invalidate_index_cache)
+        scopes.append(SITE_SCOPE)
+    touch_after_commit(*scopes)
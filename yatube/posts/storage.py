@@ -0,0 +1,75 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл называется по SHA-256 своего содержимого: posts/ab/abcd….webp.
+Одинаковая загрузка получает имя уже лежащего файла и не пишется
+второй раз, а sorl-thumbnail, который ключует миниатюры по имени
+исходника, переиспользует и готовые миниатюры. Сколько постов
+ссылается на файл, хранит MediaBlob.refs: его меняют сигналы поста,
+а команда gc_media удаляет файлы, на которые больше никто не ссылается.
+"""
+import hashlib
+import os
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    @staticmethod
+    def content_name(name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], f'{digest}{extension}')
+
+    def get_available_name(self, name, max_length=None):
+        """Имя по содержимому не меняется: занятое — значит, файл тот же.
+
+        Вызывается из _save, когда одинаковую картинку одновременно
+        сохранили два запроса; вместо имени с суффиксом _save отдаёт
+        уже записанный файл.
+        """
+        if self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+    def _save(self, name, content):
+        try:
+            return super()._save(name, content)
+        except FileExistsError:
+            return name
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        blobs = apps.get_model('posts', 'MediaBlob').objects
+        # Сначала свежая отметка: gc_media больше не удалит файл, и если
+        # он уже пропал, он записывается заново, а не остаётся без файла.
+        if not blobs.filter(name=name).update(updated=timezone.now()):
+            blobs.get_or_create(name=name, defaults={'size': content.size})
+        if not self.exists(name):
+            name = self._save(name, content)
+        return name
+
+
+def change_refs(name, delta):
+    """Меняет число ссылок на файл; файлы не из хранилища тоже учитываются."""
+    if not name:
+        return
+    blobs = apps.get_model('posts', 'MediaBlob').objects
+    if not blobs.filter(name=name).update(refs=F('refs') + delta,
+                                          updated=timezone.now()):
+        blobs.get_or_create(name=name, defaults={'refs': max(delta, 0)})
@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+AUTHOR = 'auth'
+READER = 'reader'
+GROUP_SLUG = 'test-slug'
+POST_TEXT = 'Тестовый текст'
+POSTS_URL = reverse('api:posts')
+GROUPS_URL = reverse('api:groups')
+FOLLOWS_URL = reverse('api:follows')
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR,
+                                              first_name='Лев')
+        cls.reader = User.objects.create_user(username=READER)
+        cls.group = Group.objects.create(title='Группа', slug=GROUP_SLUG,
+                                         description='Описание')
+        cls.post = Post.objects.create(text=POST_TEXT, author=cls.author,
+                                       group=cls.group)
+        for i in range(4):
+            Post.objects.create(text=f'{POST_TEXT} {i}', author=cls.reader)
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.POST_URL = reverse('api:post_detail', args=[cls.post.id])
+        cls.COMMENTS_URL = reverse('api:post_comments', args=[cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+        # TestCase не фиксирует транзакцию: метки — сразу.
+        patcher = mock.patch('django.db.transaction.on_commit',
+                             side_effect=lambda callback: callback())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_post_detail(self):
+        data = self.client.get(self.POST_URL).json()
+        self.assertEqual(data['text'], POST_TEXT)
+        self.assertEqual(data['author'], AUTHOR)
+        self.assertEqual(data['group'], GROUP_SLUG)
+        self.assertEqual(data['comment_count'], 1)
+        self.assertIsNone(data['image'])
+
+    def test_sparse_fields_narrow_sql(self):
+        """?fields= сужает и ответ, и выбираемые колонки"""
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(POSTS_URL, {'fields': 'id'}).json()
+        self.assertEqual(set(data['results'][0]), {'id'})
+        sql = queries[-1]['sql']
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn('posts_comment', sql)
+
+    def test_embed(self):
+        data = self.client.get(self.POST_URL, {
+            'fields': 'text', 'embed': 'author,group'}).json()
+        self.assertEqual(data['author']['first_name'], 'Лев')
+        self.assertEqual(data['group']['slug'], GROUP_SLUG)
+        data = self.client.get(POSTS_URL, {
+            'author': READER, 'embed': 'group'}).json()
+        self.assertIsNone(data['results'][0]['group'])
+
+    def test_cursor_pagination(self):
+        ids = []
+        url = f'{POSTS_URL}?limit=2&fields=id'
+        while url:
+            data = self.client.get(url).json()
+            ids += [post['id'] for post in data['results']]
+            url = data['next']
+        self.assertEqual(
+            ids, list(Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True)))
+        data = self.client.get(GROUPS_URL, {'limit': 1}).json()
+        self.assertEqual(data['results'][0]['slug'], GROUP_SLUG)
+        self.assertIsNone(data['next'])
+
+    def test_comments_and_follows(self):
+        data = self.client.get(self.COMMENTS_URL, {'embed': 'author'}).json()
+        self.assertEqual(data['results'][0]['author']['username'], READER)
+        self.assertEqual(self.client.get(FOLLOWS_URL).status_code, 401)
+        client = Client()
+        client.force_login(self.reader)
+        data = client.get(FOLLOWS_URL).json()
+        self.assertEqual(data['results'], [
+            {'id': Follow.objects.get().id, 'author': AUTHOR}])
+
+    def test_errors(self):
+        requests = [
+            (POSTS_URL, {'fields': 'password'}, 400),
+            (POSTS_URL, {'limit': 1000}, 400),
+            (POSTS_URL, {'cursor': 'broken'}, 400),
+            (reverse('api:post_detail', args=[0]), {}, 404),
+            (reverse('api:group_detail', args=['missing']), {}, 404),
+        ]
+        for url, params, status in requests:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
+
+    def test_responses_are_cached(self):
+        self.client.get(POSTS_URL)
+        with self.assertNumQueries(0):
+            self.client.get(POSTS_URL)
+        Post.objects.create(text='Новый пост', author=self.author)
+        data = self.client.get(POSTS_URL).json()
+        self.assertEqual(data['results'][0]['text'], 'Новый пост')
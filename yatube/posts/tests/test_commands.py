@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from posts.caching import changed_at
+from posts.models import (AuthorStats, Comment, FeedEntry, Follow, Group,
+                          Post, User)
+
+
+class CommandsTest(TestCase):
+
+    def test_benchmark_feed_indexes(self):
+        """Замер наполняет базу и возвращает индексы на место"""
+        out = StringIO()
+        call_command('benchmark_feed_indexes', seed_posts=30, seed_users=5,
+                     repeat=1, stdout=out)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 60)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(FeedEntry.objects.exists())
+        for name in ('index', 'group_posts', 'profile', 'follow_index'):
+            self.assertIn(name, out.getvalue())
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table)
+        self.assertIn('post_group_pub_date_idx', indexes)
+
+    def test_seed_posts_and_benchmark_views(self):
+        call_command('seed_posts', users=5, groups=2, posts=25, comments=10,
+                     follows=8, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Follow.objects.count(), 8)
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'run.json')
+            call_command('benchmark_views', requests=3, warmup=0,
+                         output=output, stdout=StringIO())
+            out = StringIO()
+            call_command('benchmark_views', requests=3, warmup=0, cold=True,
+                         compare=output, stdout=out)
+            with open(output, encoding='utf-8') as file:
+                results = json.load(file)
+        self.assertEqual(results['data']['Post'], 25)
+        self.assertEqual(set(results['views']), {
+            'index', 'group_posts', 'profile', 'post_detail', 'follow_index'})
+        for result in results['views'].values():
+            self.assertEqual(result['requests'], 3)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertIn('follow_index: rps', out.getvalue())
+
+    def test_import_data(self):
+        """Импорт из CSV и JSONL разрешает ссылки и пропускает битые строки"""
+        files = {
+            'users.csv': 'username,first_name\nreader,Читатель\n'
+                         'writer,Писатель\n',
+            'groups.jsonl': '{"slug": "imported", "title": "Импорт"}\n',
+            'posts.jsonl': (
+                '{"id": 500, "text": "Первый импорт", "author": "writer", '
+                '"group": "imported", "pub_date": "2020-01-02T03:04:05Z"}\n'
+                '{"text": "Без автора", "author": "nobody"}\n'
+                '{"id": 501, "text": "Второй", "author": "writer"}\n'
+                '{"id": 500, "text": "Повтор", "author": "writer"}\n'
+                '{"id": 502, "text": "Дата", "author": "writer", '
+                '"pub_date": "вчера"}\n'
+                '{"id": 503, "text": "Дата", "author": "writer", '
+                '"pub_date": "2020-02-30T00:00:00"}\n'
+                '{"id": 504, "text": "Без пояса", "author": "writer", '
+                '"pub_date": "2020-01-01T00:00:00"}\n'),
+            'comments.csv': 'post,author,text\n500,reader,Спасибо\n'
+                            '999,reader,Нет поста\nпервый,reader,Id\n',
+            'follows.csv': 'user,author\nreader,writer\nreader,reader\n',
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {}
+            for name, content in files.items():
+                paths[name.split('.')[0]] = os.path.join(directory, name)
+                with open(paths[name.split('.')[0]], 'w',
+                          encoding='utf-8') as file:
+                    file.write(content)
+            out = StringIO()
+            page_changed = changed_at('author:writer')
+            call_command('import_data', batch_size=1, stdout=out, **paths)
+        self.assertGreater(changed_at('author:writer'), page_changed)
+        writer = User.objects.get(username='writer')
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.author, writer)
+        self.assertEqual(post.group.slug, 'imported')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(Post.objects.get(pk=504).pub_date,
+                         datetime(2020, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Comment.objects.get().post, post)
+        self.assertEqual(Follow.objects.get().author, writer)
+        self.assertEqual(AuthorStats.objects.get(author=writer).posts_count,
+                         3)
+        self.assertEqual(FeedEntry.objects.filter(
+            user__username='reader').count(), 3)
+        self.assertIn('posts: 3 строк, пропущено 4', out.getvalue())
+        self.assertIn('comments: 1 строк, пропущено 2', out.getvalue())
+
+    def test_benchmark_writes(self):
+        out = StringIO()
+        call_command('benchmark_writes', workers=1, writes=3, stdout=out)
+        self.assertIn('3 записей, ошибок 0', out.getvalue())
+        self.assertFalse(User.objects.filter(
+            username='benchmark-writer').exists())
+        self.assertFalse(Post.objects.exists())
+
+
+class ConcurrencyBenchmarkTest(TransactionTestCase):
+    """Потоки обработчика не видят данных транзакции TestCase"""
+
+    def test_benchmark_concurrency(self):
+        call_command('seed_posts', users=5, groups=2, posts=25, comments=10,
+                     follows=8, stdout=StringIO())
+        out = StringIO()
+        call_command('benchmark_concurrency', concurrency=4, requests=8,
+                     threads=2, query_workers=2, stdout=out)
+        for name in ('index', 'group_posts', 'profile', 'post_detail',
+                     'follow_index'):
+            self.assertIn(name, out.getvalue())
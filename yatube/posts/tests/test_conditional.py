@@ -0,0 +1,152 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts.caching import changed_at
+from posts.models import Comment, Follow, Group, Post, User
+
+AUTHOR = 'auth'
+READER = 'reader'
+GROUP_SLUG = 'test-slug'
+OTHER_GROUP_SLUG = 'other-slug'
+POST_TEXT = 'Тестовый текст'
+INDEX_URL = reverse('posts:index')
+GROUP_LIST_URL = reverse('posts:group_list', kwargs={'slug': GROUP_SLUG})
+OTHER_GROUP_LIST_URL = reverse('posts:group_list',
+                               kwargs={'slug': OTHER_GROUP_SLUG})
+PROFILE_URL = reverse('posts:profile', kwargs={'username': AUTHOR})
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.reader = User.objects.create_user(username=READER)
+        cls.group = Group.objects.create(title='Группа', slug=GROUP_SLUG)
+        cls.other_group = Group.objects.create(title='Другая',
+                                               slug=OTHER_GROUP_SLUG)
+        cls.post = Post.objects.create(text=POST_TEXT, author=cls.author,
+                                       group=cls.group)
+        cls.POST_DETAIL_URL = reverse('posts:post_detail',
+                                      kwargs={'post_id': cls.post.id})
+
+    def setUp(self):
+        cache.clear()
+        # TestCase не фиксирует транзакцию: метки — сразу.
+        patcher = mock.patch('django.db.transaction.on_commit',
+                             side_effect=lambda callback: callback())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revalidate(self, url, client=None):
+        client = client or self.client
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified(self):
+        """Повторный запрос без изменений получает 304"""
+        urls = [
+            (INDEX_URL, None),
+            (GROUP_LIST_URL, None),
+            (PROFILE_URL, None),
+            (self.POST_DETAIL_URL, None),
+            (FOLLOW_INDEX_URL, self.reader_client),
+        ]
+        for url, client in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(url, client).status_code,
+                                 304)
+
+    def test_not_modified_without_queries(self):
+        for url in (INDEX_URL, self.POST_DETAIL_URL):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        response = self.client.get(PROFILE_URL)
+        response = self.client.get(
+            PROFILE_URL, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_page_and_user(self):
+        etags = {
+            self.client.get(INDEX_URL)['ETag'],
+            self.client.get(INDEX_URL, {'page': 2})['ETag'],
+            self.reader_client.get(INDEX_URL)['ETag'],
+        }
+        self.assertEqual(len(etags), 3)
+
+    def test_changes_invalidate_pages(self):
+        """Посты, комментарии, подписки и группы меняют ETag своих страниц"""
+        def etags():
+            return {url: self.reader_client.get(url)['ETag'] for url in (
+                INDEX_URL, GROUP_LIST_URL, OTHER_GROUP_LIST_URL, PROFILE_URL,
+                self.POST_DETAIL_URL, FOLLOW_INDEX_URL)}
+
+        changes = [
+            (lambda: Post.objects.create(text='Новый', author=self.author,
+                                         group=self.group),
+             {INDEX_URL, GROUP_LIST_URL, PROFILE_URL, self.POST_DETAIL_URL,
+              FOLLOW_INDEX_URL}),
+            (lambda: Comment.objects.create(post=self.post, text='Ответ',
+                                            author=self.reader),
+             {INDEX_URL, GROUP_LIST_URL, PROFILE_URL, self.POST_DETAIL_URL,
+              FOLLOW_INDEX_URL}),
+            (lambda: Follow.objects.create(user=self.reader,
+                                           author=self.author),
+             {PROFILE_URL, self.POST_DETAIL_URL, FOLLOW_INDEX_URL}),
+            (lambda: Group.objects.filter(pk=self.group.pk).get().save(),
+             {INDEX_URL, GROUP_LIST_URL, OTHER_GROUP_LIST_URL, PROFILE_URL,
+              self.POST_DETAIL_URL, FOLLOW_INDEX_URL}),
+        ]
+        for change, changed in changes:
+            before = etags()
+            change()
+            after = etags()
+            with self.subTest(changed=changed):
+                self.assertEqual(
+                    {url for url in before if before[url] != after[url]},
+                    changed)
+
+    def test_moving_post_invalidates_both_groups(self):
+        before = [self.client.get(url)['ETag']
+                  for url in (GROUP_LIST_URL, OTHER_GROUP_LIST_URL)]
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = self.other_group
+        post.save()
+        after = [self.client.get(url)['ETag']
+                 for url in (GROUP_LIST_URL, OTHER_GROUP_LIST_URL)]
+        self.assertNotEqual(before[0], after[0])
+        self.assertNotEqual(before[1], after[1])
+
+
+class StampCommitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_stamps_change_after_commit(self):
+        """До фиксации страницу по старым данным не отдадут под новой меткой"""
+        author = User.objects.create_user(username=AUTHOR)
+        group = Group.objects.create(title='Группа', slug=GROUP_SLUG)
+        scopes = ('index', f'group:{GROUP_SLUG}', f'author:{AUTHOR}',
+                  f'author_id:{author.pk}')
+        before = changed_at(*scopes)
+        with transaction.atomic():
+            post = Post.objects.create(text=POST_TEXT, author=author,
+                                       group=group)
+            Comment.objects.create(post=post, author=author, text='Ответ')
+            self.assertEqual(changed_at(*scopes), before)
+        self.assertGreater(changed_at(*scopes), before)
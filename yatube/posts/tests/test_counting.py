@@ -0,0 +1,93 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.counting import approximate_count, estimate_count, store_count
+from posts.models import Comment, Follow, Post, User
+
+AUTHOR = 'auth'
+OTHER = 'other'
+POST_TEXT = 'Тестовый текст'
+POSTS_AMOUNT = 15
+INDEX_URL = reverse('posts:index')
+
+
+class ApproximateCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.other = User.objects.create_user(username=OTHER)
+        Post.objects.bulk_create(
+            Post(text=POST_TEXT, author=cls.author)
+            for _ in range(POSTS_AMOUNT))
+        Post.objects.create(text=POST_TEXT, author=cls.other)
+        Follow.objects.create(user=cls.other, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_small_sets_are_exact(self):
+        cases = {
+            Post.objects.all(): POSTS_AMOUNT + 1,
+            self.author.posts.all(): POSTS_AMOUNT,
+            Comment.objects.all(): 0,
+            Follow.objects.filter(user=self.other): 1,
+        }
+        for queryset, count in cases.items():
+            with self.subTest(model=queryset.model.__name__):
+                self.assertEqual(queryset.approximate_count(), (count, True))
+
+    def test_filtered_count_is_counted_in_background(self):
+        """За порогом запрос не считает строки, число берётся из кэша"""
+        posts = self.author.posts.all()
+        with self.assertNumQueries(1):
+            self.assertEqual(posts.approximate_count(threshold=5),
+                             (6, False))
+        self.assertEqual(store_count(posts), POSTS_AMOUNT)
+        Post.objects.create(text=POST_TEXT, author=self.author)
+        with self.assertNumQueries(1):
+            self.assertEqual(approximate_count(posts, threshold=5),
+                             (POSTS_AMOUNT, False))
+
+    def test_missing_count_is_scheduled_once(self):
+        posts = self.author.posts.all()
+        with mock.patch.object(connection, 'in_atomic_block', False), \
+                mock.patch('posts.counting.get_executor') as executor:
+            self.assertIsNone(estimate_count(posts))
+            self.assertIsNone(estimate_count(posts))
+        executor.return_value.submit.assert_called_once()
+
+    def test_whole_table_uses_statistics(self):
+        """Оценка всей таблицы берётся из статистики базы после ANALYZE"""
+        call_command('update_count_statistics', stdout=StringIO())
+        Post.objects.bulk_create(
+            Post(text=POST_TEXT, author=self.other) for _ in range(3))
+        with self.assertNumQueries(2):
+            self.assertEqual(Post.objects.approximate_count(threshold=5),
+                             (POSTS_AMOUNT + 1, False))
+
+    def test_estimate_is_never_below_counted(self):
+        with mock.patch('posts.counting.table_estimate', return_value=2):
+            self.assertEqual(Post.objects.approximate_count(threshold=5),
+                             (6, False))
+
+    def test_paginator_shows_estimated_pages(self):
+        call_command('update_count_statistics', stdout=StringIO())
+        with mock.patch('posts.views.PAGINATOR_COUNT_LIMIT', 5):
+            response = self.client.get(INDEX_URL)
+        self.assertEqual(response.context['page_obj'].paginator
+                         .estimated_pages, 2)
+        self.assertContains(response, 'из ≈ 2<')
+
+    def test_paginator_without_estimate(self):
+        """Без статистики и фонового счёта — нижняя граница с «+»"""
+        with mock.patch('posts.views.PAGINATOR_COUNT_LIMIT', 10):
+            response = self.client.get(INDEX_URL)
+        self.assertIsNone(response.context['page_obj'].paginator
+                          .estimated_count)
+        self.assertContains(response, 'из ≈ 2+')
@@ -0,0 +1,74 @@
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.settings import FEED_ITEMS
+
+AUTHOR = 'auth'
+GROUP_SLUG = 'test-slug'
+POST_TEXT = 'Тестовый текст'
+NEW_TEXT = 'Новый текст'
+INDEX_RSS_URL = reverse('posts:index_rss')
+INDEX_ATOM_URL = reverse('posts:index_atom')
+GROUP_RSS_URL = reverse('posts:group_rss', args=[GROUP_SLUG])
+GROUP_ATOM_URL = reverse('posts:group_atom', args=[GROUP_SLUG])
+AUTHOR_RSS_URL = reverse('posts:author_rss', args=[AUTHOR])
+AUTHOR_ATOM_URL = reverse('posts:author_atom', args=[AUTHOR])
+ATOM_ENTRY = '{http://www.w3.org/2005/Atom}entry'
+
+
+class FeedsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.group = Group.objects.create(title='Группа', slug=GROUP_SLUG)
+        Post.objects.bulk_create(
+            Post(text=f'{POST_TEXT} {i}', author=cls.author, group=cls.group)
+            for i in range(FEED_ITEMS + 5))
+
+    def setUp(self):
+        cache.clear()
+        # TestCase не фиксирует транзакцию: метки — сразу.
+        patcher = mock.patch('django.db.transaction.on_commit',
+                             side_effect=lambda callback: callback())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def items(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        root = ElementTree.fromstring(response.content)
+        if url.endswith('/atom/'):
+            return root.findall(ATOM_ENTRY)
+        return root.findall('channel/item')
+
+    def test_feeds(self):
+        """Ленты отдают не больше FEED_ITEMS записей"""
+        for url in (INDEX_RSS_URL, INDEX_ATOM_URL, GROUP_RSS_URL,
+                    GROUP_ATOM_URL, AUTHOR_RSS_URL, AUTHOR_ATOM_URL):
+            with self.subTest(url=url):
+                self.assertEqual(len(self.items(url)), FEED_ITEMS)
+
+    def test_feed_is_cached_and_invalidated(self):
+        self.client.get(GROUP_RSS_URL)
+        with self.assertNumQueries(0):
+            self.client.get(GROUP_RSS_URL)
+        Post.objects.create(text=NEW_TEXT, author=self.author,
+                            group=self.group)
+        self.assertContains(self.client.get(GROUP_RSS_URL), NEW_TEXT)
+
+    def test_conditional_get(self):
+        response = self.client.get(AUTHOR_ATOM_URL)
+        response = self.client.get(AUTHOR_ATOM_URL,
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_unknown_group(self):
+        response = self.client.get(
+            reverse('posts:group_rss', args=['missing']))
+        self.assertEqual(response.status_code, 404)
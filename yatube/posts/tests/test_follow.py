@@ -1,12 +1,19 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import Client, TestCase
 from django.urls import reverse
 
-from posts.models import Post, User, Follow
+from posts.counters import author_stats
+from posts.models import FeedEntry, Post, User, Follow
+from posts.tests.test_thumbnails import SyncExecutor
 
 POSTER = 'poster'
 NEW_FOLLOWER = 'new_follower'
 NOT_FOLLOWER = 'not_follower'
 POST_TEXT = 'Тестовый текст'
+NEW_POST_TEXT = 'Новый пост'
 POST_CREATE_URL = reverse('posts:post_create')
 FOLLOW_INDEX_URL = reverse('posts:follow_index')
 FOLLOW_URL = reverse('posts:profile_follow',
@@ -56,3 +63,105 @@ class FormsTests(TestCase):
                 author=self.poster
             ).exists()
         )
+
+    def test_feed_filled_on_write(self):
+        """Новый пост автора попадает в материализованную ленту"""
+        self.new_follower_client.get(FOLLOW_URL)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.new_follower, post=self.post).exists())
+        self.client.force_login(self.poster)
+        self.client.post(POST_CREATE_URL, data={'text': NEW_POST_TEXT})
+        new_post = Post.objects.get(text=NEW_POST_TEXT)
+        response = self.new_follower_client.get(FOLLOW_INDEX_URL)
+        self.assertIn(new_post, response.context['page_obj'])
+        self.assertNotIn(new_post, self.unfollower_client.get(
+            FOLLOW_INDEX_URL).context['page_obj'])
+        self.new_follower_client.get(UNFOLLOW_URL)
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.new_follower).exists())
+
+    def test_feed_fan_out_on_read(self):
+        """Посты популярных авторов подмешиваются при чтении"""
+        with mock.patch('posts.timeline.FANOUT_FOLLOWERS_LIMIT', 0):
+            self.new_follower_client.get(FOLLOW_URL)
+            new_post = Post.objects.create(text=NEW_POST_TEXT,
+                                           author=self.poster)
+            self.assertFalse(FeedEntry.objects.exists())
+            response = self.new_follower_client.get(FOLLOW_INDEX_URL)
+            self.assertIn(new_post, response.context['page_obj'])
+            self.assertIn(self.post, response.context['page_obj'])
+
+    @mock.patch('posts.timeline.get_executor', return_value=SyncExecutor())
+    @mock.patch('django.db.transaction.on_commit',
+                side_effect=lambda callback: callback())
+    @mock.patch('posts.timeline.FANOUT_FOLLOWERS_RESUME', 1)
+    @mock.patch('posts.timeline.FANOUT_FOLLOWERS_LIMIT', 1)
+    def test_unfollow_fans_out_author(self, on_commit, executor):
+        """Автор, опустившийся до порога, раскладывается по лентам в фоне"""
+        self.new_follower_client.get(FOLLOW_URL)
+        self.unfollower_client.get(FOLLOW_URL)
+        new_post = Post.objects.create(text=NEW_POST_TEXT,
+                                       author=self.poster)
+        self.assertFalse(FeedEntry.objects.filter(post=new_post).exists())
+        self.unfollower_client.get(UNFOLLOW_URL)
+        self.assertEqual(
+            set(FeedEntry.objects.values_list('user', 'post')),
+            {(self.new_follower.id, self.post.id),
+             (self.new_follower.id, new_post.id)})
+        self.assertTrue(author_stats(self.poster.id).fanned_out)
+
+    @mock.patch('django.db.transaction.on_commit',
+                side_effect=lambda callback: callback())
+    @mock.patch('posts.timeline.FANOUT_FOLLOWERS_RESUME', 0)
+    @mock.patch('posts.timeline.FANOUT_FOLLOWERS_LIMIT', 1)
+    def test_fan_out_threshold_has_hysteresis(self, on_commit):
+        """Отписка у порога не возвращает раскладку автора"""
+        self.new_follower_client.get(FOLLOW_URL)
+        self.unfollower_client.get(FOLLOW_URL)
+        with mock.patch('posts.timeline.get_executor') as get_executor:
+            self.unfollower_client.get(UNFOLLOW_URL)
+            self.unfollower_client.get(FOLLOW_URL)
+            self.unfollower_client.get(UNFOLLOW_URL)
+        get_executor.assert_not_called()
+        self.assertFalse(author_stats(self.poster.id).fanned_out)
+
+    def test_feed_cursor_pagination(self):
+        """Курсор ленты подписок листает записи FeedEntry"""
+        self.new_follower_client.get(FOLLOW_URL)
+        new_post = Post.objects.create(text=NEW_POST_TEXT, author=self.poster)
+        with mock.patch('posts.views.POSTS_PER_PAGE', 1):
+            first = self.new_follower_client.get(
+                FOLLOW_INDEX_URL, {'cursor': ''}).context['page_obj']
+            second = self.new_follower_client.get(
+                FOLLOW_INDEX_URL,
+                {'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual(list(first), [new_post])
+        self.assertEqual(list(second), [self.post])
+        self.assertFalse(second.has_next())
+
+    def test_counters(self):
+        """Счётчики подписок и постов меняются вместе с данными"""
+        self.new_follower_client.get(FOLLOW_URL)
+        poster_stats = author_stats(self.poster.id)
+        self.assertEqual(poster_stats.followers_count, 1)
+        self.assertEqual(poster_stats.posts_count, 1)
+        self.assertEqual(
+            author_stats(self.new_follower.id).following_count, 1)
+        self.new_follower_client.get(UNFOLLOW_URL)
+        Post.objects.filter(pk=self.post.pk).delete()
+        poster_stats = author_stats(self.poster.id)
+        self.assertEqual(poster_stats.followers_count, 0)
+        self.assertEqual(poster_stats.posts_count, 0)
+        self.assertEqual(
+            author_stats(self.new_follower.id).following_count, 0)
+
+    def test_recount_author_stats(self):
+        Follow.objects.bulk_create(
+            [Follow(user=self.unfollower, author=self.poster)])
+        Post.objects.bulk_create([Post(text=POST_TEXT, author=self.poster)])
+        call_command('recount_author_stats', stdout=StringIO())
+        poster_stats = author_stats(self.poster.id)
+        self.assertEqual(poster_stats.followers_count, 1)
+        self.assertEqual(poster_stats.posts_count, 2)
+        self.assertEqual(
+            author_stats(self.unfollower.id).following_count, 1)
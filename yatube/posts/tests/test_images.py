@@ -0,0 +1,201 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from posts.models import MediaBlob, Post, User
+from posts.settings import IMAGE_MAX_SIZE
+
+AUTHOR = 'auth'
+POST_TEXT = 'Тестовый текст'
+POST_CREATE_URL = reverse('posts:post_create')
+WEBP_NAME = r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.webp$'
+JPEG_NAME = r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$'
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def photo(name='photo.jpg', size=(3000, 1000), orientation=None):
+    image = Image.new('RGB', size, (200, 100, 50))
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera maker'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch('posts.views.schedule_thumbnails')
+class ImagePipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, image):
+        self.author_client.post(POST_CREATE_URL,
+                                {'text': POST_TEXT, 'image': image})
+        return Post.objects.latest('id')
+
+    def test_upload_is_downscaled_and_stripped(self, schedule):
+        """Картинка уменьшается, теряет EXIF и пересохраняется в WebP"""
+        upload = photo()
+        post = self.create_post(upload)
+        self.assertRegex(post.image.name, WEBP_NAME)
+        self.assertEqual((post.image_width, post.image_height),
+                         (IMAGE_MAX_SIZE, IMAGE_MAX_SIZE // 3))
+        self.assertEqual(post.image_size, post.image.size)
+        self.assertLess(post.image_size, upload.size)
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'WEBP')
+            self.assertEqual(len(stored.getexif()), 0)
+        schedule.assert_called_once()
+
+    def test_exif_orientation_is_applied(self, schedule):
+        post = self.create_post(photo(size=(400, 200), orientation=6))
+        self.assertEqual((post.image_width, post.image_height), (200, 400))
+
+    @mock.patch('posts.images.features.check', return_value=False)
+    def test_jpeg_fallback(self, check, schedule):
+        post = self.create_post(photo())
+        self.assertRegex(post.image.name, JPEG_NAME)
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertNotIn('exif', stored.info)
+
+    def test_broken_upload_is_form_error(self, schedule):
+        """Обрезанный файл не роняет сервер, а возвращает форму с ошибкой"""
+        content = photo().read()
+        broken = SimpleUploadedFile('broken.jpg', content[:len(content) // 2],
+                                    content_type='image/jpeg')
+        posts = Post.objects.count()
+        response = self.author_client.post(
+            POST_CREATE_URL, {'text': POST_TEXT, 'image': broken})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', 'image',
+                             'Не удалось прочитать изображение')
+        self.assertEqual(Post.objects.count(), posts)
+        schedule.assert_not_called()
+
+    @mock.patch('posts.images.ImageOps.exif_transpose',
+                side_effect=Image.DecompressionBombError)
+    def test_decompression_bomb_on_edit(self, transpose, schedule):
+        post = Post.objects.create(text=POST_TEXT, author=self.author)
+        response = self.author_client.post(
+            reverse('posts:post_edit', args=[post.id]),
+            {'text': POST_TEXT, 'image': photo()})
+        self.assertFormError(response, 'form', 'image',
+                             'Не удалось прочитать изображение')
+        post.refresh_from_db()
+        self.assertFalse(post.image)
+
+    def test_edit_updates_dimensions(self, schedule):
+        post = self.create_post(photo())
+        self.author_client.post(
+            reverse('posts:post_edit', args=[post.id]),
+            {'text': POST_TEXT, 'image': photo('small.jpg', (300, 200))})
+        post.refresh_from_db()
+        self.assertRegex(post.image.name, WEBP_NAME)
+        self.assertEqual((post.image_width, post.image_height), (300, 200))
+
+    def test_process_images_command(self, schedule):
+        upload = photo('old.jpg')
+        post = Post.objects.create(text=POST_TEXT, author=self.author,
+                                   image=upload)
+        original = post.image.name
+        call_command('process_images', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertRegex(post.image.name, WEBP_NAME)
+        self.assertEqual(post.image_width, IMAGE_MAX_SIZE)
+        self.assertFalse(Post.objects.filter(image_size=None).exists())
+        self.assertEqual(MediaBlob.objects.get(name=original).refs, 0)
+        self.assertEqual(MediaBlob.objects.get(name=post.image.name).refs, 1)
+
+    def test_identical_uploads_share_file(self, schedule):
+        """Одинаковые картинки хранятся одним файлом со счётчиком ссылок"""
+        first = self.create_post(photo('first.jpg'))
+        second = self.create_post(photo('second.jpg'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).refs, 2)
+        first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).refs, 1)
+
+    def test_concurrent_identical_upload_keeps_name(self, schedule):
+        """Файл, записанный другим запросом между проверкой и записью"""
+        storage = Post._meta.get_field('image').storage
+        first = storage.save('posts/first.jpg', photo())
+        with mock.patch.object(type(storage), 'exists', side_effect=[
+                False, True]):
+            second = storage.save('posts/second.jpg', photo())
+        self.assertEqual(first, second)
+        self.assertEqual(os.listdir(os.path.dirname(storage.path(first))),
+                         [os.path.basename(first)])
+
+    def test_upload_during_gc_keeps_file(self, schedule):
+        """gc_media между проверкой файла и записью не удаляет его"""
+        storage = Post._meta.get_field('image').storage
+        name = storage.save('posts/first.jpg', photo())
+        MediaBlob.objects.filter(name=name).update(
+            updated=timezone.now() - timedelta(days=1))
+        exists = type(storage).exists
+
+        def exists_then_gc(self, name):
+            result = exists(self, name)
+            call_command('gc_media', stdout=StringIO())
+            return result
+
+        with mock.patch.object(type(storage), 'exists', exists_then_gc):
+            self.assertEqual(storage.save('posts/second.jpg', photo()), name)
+        self.assertTrue(storage.exists(name))
+        self.assertTrue(MediaBlob.objects.filter(name=name).exists())
+
+    def test_edit_releases_previous_image(self, schedule):
+        post = self.create_post(photo())
+        previous = post.image.name
+        self.author_client.post(
+            reverse('posts:post_edit', args=[post.id]),
+            {'text': POST_TEXT, 'image': photo('small.jpg', (300, 200))})
+        post.refresh_from_db()
+        self.assertEqual(MediaBlob.objects.get(name=previous).refs, 0)
+        self.assertEqual(MediaBlob.objects.get(name=post.image.name).refs, 1)
+
+    def test_gc_media_removes_unreferenced_files(self, schedule):
+        kept = self.create_post(photo('kept.jpg', (500, 500)))
+        removed = self.create_post(photo('removed.jpg', (600, 600)))
+        name = removed.image.name
+        storage = removed.image.storage
+        removed.delete()
+        call_command('gc_media', stdout=StringIO())
+        self.assertTrue(storage.exists(name))
+        call_command('gc_media', grace=-1, stdout=StringIO())
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertTrue(storage.exists(kept.image.name))
+
+    def test_gc_media_recount(self, schedule):
+        post = self.create_post(photo())
+        MediaBlob.objects.filter(name=post.image.name).update(refs=0)
+        call_command('gc_media', grace=-1, recount=True, stdout=StringIO())
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertEqual(MediaBlob.objects.get(name=post.image.name).refs, 1)
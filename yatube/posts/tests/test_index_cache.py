@@ -1,10 +1,17 @@
-from django.test import Client, TestCase
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
 from django.urls import reverse
 
-from posts.models import Post, User
+from posts.caching import index_cache_version
+from posts.models import Comment, Group, Post, User
+from posts.settings import POSTS_PER_PAGE
 
 AUTHOR = 'auth'
 POST_TEXT = 'Тестовый текст'
+NEW_TEXT = 'Новый текст'
 INDEX_URL = reverse('posts:index')
 
 
@@ -19,11 +26,80 @@ class TaskPagesTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
+        # TestCase не фиксирует транзакцию: сбросы кэша — сразу.
+        patcher = mock.patch('django.db.transaction.on_commit',
+                             side_effect=lambda callback: callback())
+        patcher.start()
+        self.addCleanup(patcher.stop)
         self.author_client = Client()
         self.author_client.force_login(self.author)
 
     def test_index_cache(self):
         content_one = self.author_client.get(INDEX_URL).content
-        self.post.delete()
+        Post.objects.filter(pk=self.post.pk).update(text=NEW_TEXT)
         content_two = self.author_client.get(INDEX_URL).content
         self.assertEqual(content_one, content_two)
+
+    def test_index_cache_invalidated(self):
+        """Создание, правка и удаление поста сбрасывают кэш"""
+        contents = [self.author_client.get(INDEX_URL).content]
+        new_post = Post.objects.create(text=NEW_TEXT, author=self.author)
+        contents.append(self.author_client.get(INDEX_URL).content)
+        new_post.text = POST_TEXT
+        new_post.save()
+        contents.append(self.author_client.get(INDEX_URL).content)
+        new_post.delete()
+        contents.append(self.author_client.get(INDEX_URL).content)
+        for before, after in zip(contents, contents[1:]):
+            self.assertNotEqual(before, after)
+
+    def test_index_cache_invalidated_by_comments(self):
+        """Новый и удалённый комментарий меняют число на главной"""
+        self.author_client.get(INDEX_URL)
+        comment = Comment.objects.create(post=self.post, author=self.author,
+                                         text=NEW_TEXT)
+        self.assertContains(self.author_client.get(INDEX_URL),
+                            'Комментариев: 1')
+        comment.delete()
+        self.assertContains(self.author_client.get(INDEX_URL),
+                            'Комментариев: 0')
+
+    def test_index_cache_invalidated_by_group_rename(self):
+        group = Group.objects.create(title=POST_TEXT, slug='group')
+        Post.objects.create(text=POST_TEXT, author=self.author, group=group)
+        self.author_client.get(INDEX_URL)
+        group.title = NEW_TEXT
+        group.save()
+        self.assertContains(self.author_client.get(INDEX_URL), NEW_TEXT)
+
+    def test_index_cache_varies_on_page_and_login(self):
+        Post.objects.bulk_create(
+            Post(text=NEW_TEXT, author=self.author)
+            for i in range(POSTS_PER_PAGE)
+        )
+        pages = [
+            self.author_client.get(INDEX_URL).content,
+            self.author_client.get(INDEX_URL + '?page=2').content,
+            self.client.get(INDEX_URL).content,
+        ]
+        self.assertEqual(len(set(pages)), len(pages))
+
+
+class IndexCacheCommitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_version_changes_after_commit(self):
+        """До фиксации главная не закэширует старые данные под новой версией"""
+        author = User.objects.create_user(username=AUTHOR)
+        group = Group.objects.create(title=POST_TEXT, slug='group')
+        version = index_cache_version()
+        with transaction.atomic():
+            post = Post.objects.create(text=POST_TEXT, author=author,
+                                       group=group)
+            Comment.objects.create(post=post, author=author, text=NEW_TEXT)
+            group.title = NEW_TEXT
+            group.save()
+            self.assertEqual(index_cache_version(), version)
+        self.assertGreater(index_cache_version(), version)
@@ -1,7 +1,12 @@
+from unittest import mock
+
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import Post, User, Group
+from posts.paginators import ElidedPaginator, FeedPaginator
 from posts.settings import POSTS_PER_PAGE
 
 AUTHOR = 'auth'
@@ -11,6 +16,7 @@ POST_TEXT = 'Тестовый текст'
 INDEX_URL = reverse('posts:index')
 GROUP_LIST_URL = reverse('posts:group_list', kwargs={'slug': GROUP_SLUG})
 PROFILE_URL = reverse('posts:profile', kwargs={'username': AUTHOR})
+ELLIPSIS = ElidedPaginator.ELLIPSIS
 
 
 class PaginatorViewsTest(TestCase):
@@ -49,3 +55,68 @@ class PaginatorViewsTest(TestCase):
             with self.subTest(url=url):
                 response = self.client.get(url)
                 self.assertEqual(len(response.context['page_obj']), number)
+
+    def test_cursor_paginator(self):
+        """Курсорная пагинация проходит ленту без повторов и OFFSET"""
+        for url in [INDEX_URL, GROUP_LIST_URL, PROFILE_URL]:
+            with self.subTest(url=url):
+                first = self.client.get(url + '?cursor=').context['page_obj']
+                self.assertEqual(len(first), POSTS_PER_PAGE)
+                self.assertFalse(first.has_previous())
+                with CaptureQueriesContext(connection) as queries:
+                    second = self.client.get(
+                        f'{url}?cursor={first.next_cursor}'
+                    ).context['page_obj']
+                self.assertFalse(any(
+                    'OFFSET' in query['sql'] for query in queries))
+                self.assertEqual(len(second), 3)
+                self.assertFalse(second.has_next())
+                ids = [post.id for post in list(first) + list(second)]
+                self.assertEqual(len(set(ids)), self.posts_amount)
+                back = self.client.get(
+                    f'{url}?cursor={second.previous_cursor}'
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+
+    def test_cursor_paginator_bad_cursor(self):
+        response = self.client.get(INDEX_URL + '?cursor=broken')
+        self.assertEqual(len(response.context['page_obj']), POSTS_PER_PAGE)
+
+    def test_elided_page_range(self):
+        """Навигация показывает окно вокруг текущей страницы и края"""
+        paginator = ElidedPaginator(Post.objects.order_by('id'), 1)
+        cases = {
+            1: [1, 2, 3, 4, ELLIPSIS, 13],
+            7: [1, ELLIPSIS, 4, 5, 6, 7, 8, 9, 10, ELLIPSIS, 13],
+            12: [1, ELLIPSIS, 9, 10, 11, 12, 13],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                page = paginator.page(number)
+                self.assertEqual(
+                    list(paginator.get_elided_page_range(page)), expected)
+
+    def test_count_limit(self):
+        """Длинная лента не считается целиком, последняя страница неизвестна"""
+        paginator = FeedPaginator(Post.objects.order_by('id'), 1,
+                                  count_limit=5)
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.page(8)
+        self.assertIn('LIMIT 6', queries[0]['sql'])
+        self.assertFalse(paginator.count_exact)
+        self.assertIsNone(paginator.num_pages)
+        self.assertTrue(page.has_next())
+        self.assertEqual(list(paginator.get_elided_page_range(page)),
+                         [1, ELLIPSIS, 5, 6, 7, 8, 9, ELLIPSIS])
+        last = paginator.page(self.posts_amount)
+        self.assertFalse(last.has_next())
+        self.assertEqual(last.end_index(), self.posts_amount)
+        self.assertEqual(paginator.get_page(100).number, 1)
+
+    def test_navigation_without_count(self):
+        """Без точного числа постов нет ссылки на последнюю страницу"""
+        self.assertContains(self.client.get(GROUP_LIST_URL), 'Последняя')
+        with mock.patch('posts.views.PAGINATOR_COUNT_LIMIT', 5):
+            response = self.client.get(GROUP_LIST_URL)
+        self.assertContains(response, '?page=2')
+        self.assertNotContains(response, 'Последняя')
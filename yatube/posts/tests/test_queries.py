@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.settings import POSTS_PER_PAGE
+
+AUTHOR = 'auth'
+FOLLOWER = 'follower'
+GROUP_SLUG = 'test-slug'
+POST_TEXT = 'Тестовый текст'
+INDEX_URL = reverse('posts:index')
+GROUP_LIST_URL = reverse('posts:group_list', kwargs={'slug': GROUP_SLUG})
+PROFILE_URL = reverse('posts:profile', kwargs={'username': AUTHOR})
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.follower = User.objects.create_user(username=FOLLOWER)
+        cls.group = Group.objects.create(title='Группа', slug=GROUP_SLUG)
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        for i in range(POSTS_PER_PAGE):
+            post = Post.objects.create(
+                text=POST_TEXT,
+                author=User.objects.create_user(username=f'user{i}'),
+                group=Group.objects.create(title=f'{i}', slug=f'slug-{i}')
+            )
+            Comment.objects.create(post=post, author=cls.author,
+                                   text=POST_TEXT)
+            Post.objects.create(text=POST_TEXT, author=cls.author,
+                                group=cls.group)
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_query_budget(self):
+        """Число запросов ленты не зависит от числа постов на странице"""
+        budgets = [
+            [INDEX_URL, self.client, 2],
+            [GROUP_LIST_URL, self.client, 3],
+            [PROFILE_URL, self.client, 4],
+            # Записи ленты и посты страницы — отдельные запросы.
+            [FOLLOW_INDEX_URL, self.follower_client, 6],
+        ]
+        for url, client, queries in budgets:
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    response = client.get(url)
+                self.assertEqual(len(response.context['page_obj']),
+                                 POSTS_PER_PAGE)
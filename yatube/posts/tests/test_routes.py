@@ -14,13 +14,22 @@ class RoutesModelTest(TestCase):
         """Проверяем маршруты"""
         routes = [
             ['/', 'index', None],
+            ['/rss/', 'index_rss', None],
+            ['/atom/', 'index_atom', None],
             [f'/group/{GROUP_SLUG}/', 'group_list', [GROUP_SLUG]],
+            [f'/group/{GROUP_SLUG}/rss/', 'group_rss', [GROUP_SLUG]],
+            [f'/group/{GROUP_SLUG}/atom/', 'group_atom', [GROUP_SLUG]],
             [f'/profile/{USERNAME}/', 'profile', [USERNAME]],
+            [f'/profile/{USERNAME}/rss/', 'author_rss', [USERNAME]],
+            [f'/profile/{USERNAME}/atom/', 'author_atom', [USERNAME]],
             [f'/posts/{POST_ID}/', 'post_detail', [POST_ID]],
             ['/create/', 'post_create', None],
             [f'/posts/{POST_ID}/edit/', 'post_edit', [POST_ID]],
             [f'/posts/{POST_ID}/comment', 'add_comment', [POST_ID]],
+            [f'/posts/{POST_ID}/comments/', 'post_comments', [POST_ID]],
+            [f'/profile/{USERNAME}/export/', 'profile_export', [USERNAME]],
             ['/follow/', 'follow_index', None],
+            ['/search/', 'search', None],
             [f'/profile/{USERNAME}/follow/', 'profile_follow', [USERNAME]],
             [f'/profile/{USERNAME}/unfollow/', 'profile_unfollow', [USERNAME]]
         ]
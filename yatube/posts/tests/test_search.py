@@ -0,0 +1,71 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.search import (PythonBackend, SearchResults, filter_posts,
+                          get_backend)
+from posts.settings import POSTS_PER_PAGE
+
+AUTHOR = 'auth'
+SEARCH_URL = reverse('posts:search')
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.cat = Post.objects.create(
+            text='Кот сидит на окне', author=cls.author)
+        cls.cats = Post.objects.create(
+            text='Кот и ещё кот, коты повсюду', author=cls.author)
+        cls.dog = Post.objects.create(
+            text='Собака лает', author=cls.author)
+
+    def test_backends_rank_and_match_all_words(self):
+        python_backend = PythonBackend()
+        for post in Post.objects.all():
+            python_backend.index(post)
+        for backend in (get_backend(), python_backend):
+            with self.subTest(backend=type(backend).__name__):
+                results = SearchResults('КОТ', backend=backend)
+                self.assertEqual(results.count(), 2)
+                self.assertEqual(list(results[0:10]), [self.cats, self.cat])
+                results = SearchResults('кот окне', backend=backend)
+                self.assertEqual(list(results[0:10]), [self.cat])
+                self.assertEqual(
+                    SearchResults('слон', backend=backend).count(), 0)
+
+    def test_index_follows_edit_and_delete(self):
+        self.dog.text = 'Кот прогнал собаку'
+        self.dog.save()
+        self.assertIn(self.dog, SearchResults('кот')[0:10])
+        self.assertNotIn(self.dog, SearchResults('лает')[0:10])
+        dog_id = self.dog.id
+        Post.objects.filter(pk=dog_id).delete()
+        self.assertEqual(SearchResults('собаку').count(), 0)
+
+    def test_search_view(self):
+        Post.objects.bulk_create(
+            Post(text='Кот', author=self.author)
+            for i in range(POSTS_PER_PAGE))
+        for post in Post.objects.filter(text='Кот'):
+            get_backend().index(post)
+        response = self.client.get(SEARCH_URL, {'q': 'кот'})
+        self.assertEqual(len(response.context['page_obj']), POSTS_PER_PAGE)
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%82&amp;page=2')
+        response = self.client.get(SEARCH_URL, {'q': 'кот', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 2)
+        response = self.client.get(SEARCH_URL)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_admin_search(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'собака'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.dog])
+        self.assertEqual(
+            list(filter_posts(Post.objects.all(), '!!!')), [])
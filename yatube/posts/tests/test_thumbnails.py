@@ -0,0 +1,85 @@
+import shutil
+import tempfile
+from concurrent.futures import Future
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.settings import THUMBNAIL_SIZES
+from posts.thumbnails import generate_thumbnails
+
+AUTHOR = 'auth'
+POST_TEXT = 'Тестовый текст'
+POST_CREATE_URL = reverse('posts:post_create')
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+small_gif = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class SyncExecutor:
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @mock.patch('posts.thumbnails.get_thumbnail')
+    def test_generate_all_sizes(self, get_thumbnail):
+        generate_thumbnails('posts/small.gif')
+        self.assertEqual(get_thumbnail.call_count, len(THUMBNAIL_SIZES))
+        for call, (geometry, options) in zip(get_thumbnail.call_args_list,
+                                             THUMBNAIL_SIZES):
+            image = call[0][0]
+            self.assertEqual(call, mock.call(image, geometry, **options))
+            self.assertEqual(image.name, 'posts/small.gif')
+            self.assertIs(image.storage, Post.image.field.storage)
+
+    @mock.patch('posts.thumbnails.get_thumbnail', side_effect=OSError)
+    def test_generate_errors_are_logged(self, get_thumbnail):
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            generate_thumbnails('posts/broken.gif')
+
+    @mock.patch('posts.thumbnails.get_thumbnail')
+    @mock.patch('posts.thumbnails.get_executor', return_value=SyncExecutor())
+    @mock.patch('posts.thumbnails.transaction.on_commit',
+                side_effect=lambda callback: callback())
+    def test_thumbnails_scheduled_on_create(self, on_commit, executor,
+                                            get_thumbnail):
+        """Миниатюры нового поста строятся в фоне, а не в ленте"""
+        self.author_client.post(POST_CREATE_URL, data={
+            'text': POST_TEXT,
+            'image': SimpleUploadedFile(name='small.gif', content=small_gif,
+                                        content_type='image/gif'),
+        })
+        post = Post.objects.get(text=POST_TEXT)
+        # После фиксации сбрасывается и кэш главной.
+        on_commit.assert_called()
+        geometry, options = THUMBNAIL_SIZES[-1]
+        get_thumbnail.assert_called_with(mock.ANY, geometry, **options)
+        self.assertEqual(get_thumbnail.call_args[0][0].name, post.image.name)
@@ -1,8 +1,15 @@
+import csv
+import io
+import json
+
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Post, User, Group, Follow
+from posts.models import Comment, Post, User, Group, Follow
+from posts.settings import COMMENTS_PER_PAGE
 
 AUTHOR = 'auth'
 FOLLOWER = 'follower'
@@ -109,3 +116,94 @@ class TaskPagesTests(TestCase):
             with self.subTest(url=url):
                 response = self.author.get(url)
                 self.assertNotIn(self.post, response.context['page_obj'])
+
+
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.post = Post.objects.create(text=POST_TEXT, author=cls.author)
+        cls.POST_DETAIL_URL = reverse('posts:post_detail',
+                                      kwargs={'post_id': cls.post.id})
+        cls.COMMENTS_URL = reverse('posts:post_comments',
+                                   kwargs={'post_id': cls.post.id})
+
+    def add_comments(self, amount):
+        start = Comment.objects.count()
+        for i in range(start, start + amount):
+            Comment.objects.create(
+                post=self.post,
+                author=User.objects.create_user(username=f'reader{i}'),
+                text=f'Комментарий {i}'
+            )
+
+    def test_comments_are_paginated(self):
+        """Комментарии выводятся порциями, следующая — фрагментом"""
+        self.add_comments(COMMENTS_PER_PAGE + 5)
+        comments = self.client.get(self.POST_DETAIL_URL).context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text,
+                         f'Комментарий {COMMENTS_PER_PAGE + 4}')
+        response = self.client.get(self.COMMENTS_URL,
+                                   {'cursor': comments.next_cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertNotContains(response, 'data-comments-more')
+        self.assertContains(response, 'Комментарий 0')
+
+    def test_comments_of_missing_post(self):
+        response = self.client.get(reverse('posts:post_comments',
+                                           kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_comments_query_count_is_constant(self):
+        self.add_comments(1)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.POST_DETAIL_URL)
+        self.add_comments(COMMENTS_PER_PAGE * 2)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.POST_DETAIL_URL)
+        self.assertEqual(len(few), len(many))
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author_user = User.objects.create_user(username=AUTHOR)
+        cls.author = Client()
+        cls.author.force_login(cls.author_user)
+        cls.group = Group.objects.create(title=GROUP_TITLE, slug=GROUP_SLUG)
+        cls.post = Post.objects.create(text=POST_TEXT, author=cls.author_user,
+                                       group=cls.group)
+        Post.objects.create(
+            text=OTHER_TEXT,
+            author=User.objects.create_user(username=FOLLOWER))
+        cls.EXPORT_URL = reverse('posts:profile_export',
+                                 kwargs={'username': AUTHOR})
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_formats(self):
+        """Автор получает потоковую выгрузку только своих постов"""
+        response = self.author.get(self.EXPORT_URL, {'format': 'csv'})
+        rows = list(csv.reader(io.StringIO(self.read(response))))
+        self.assertEqual(rows[0], ['id', 'text', 'author', 'group',
+                                   'pub_date'])
+        self.assertEqual(rows[1][:4], [str(self.post.id), POST_TEXT, AUTHOR,
+                                       GROUP_SLUG])
+        self.assertEqual(len(rows), 2)
+        response = self.author.get(self.EXPORT_URL, {'format': 'jsonl'})
+        self.assertEqual(response['Content-Type'],
+                         'application/x-ndjson; charset=utf-8')
+        lines = self.read(response).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['text'], POST_TEXT)
+
+    def test_export_is_only_for_owner(self):
+        other = Client()
+        other.force_login(User.objects.get(username=FOLLOWER))
+        self.assertRedirects(other.get(self.EXPORT_URL), PROFILE_URL)
@@ -0,0 +1,50 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+После сохранения поста миниатюры нужных размеров строятся в пуле
+потоков, и тег {% thumbnail %} в лентах находит их готовыми
+в хранилище sorl-thumbnail, не декодируя картинку во время запроса.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections, transaction
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+from .settings import THUMBNAIL_SIZES, THUMBNAIL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS,
+                                       thread_name_prefix='thumbnails')
+    return _executor
+
+
+def generate_thumbnails(image_name):
+    # С хранилищем поля ключ миниатюр совпадёт с ключом {% thumbnail %}.
+    image = ImageFile(image_name, Post._meta.get_field('image').storage)
+    try:
+        for geometry, options in THUMBNAIL_SIZES:
+            get_thumbnail(image, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры %s', image_name)
+    finally:
+        # Соединения с БД у каждого потока свои, хранилище миниатюр
+        # могло открыть их в потоке пула.
+        connections.close_all()
+
+
+def schedule_thumbnails(post):
+    """Ставит построение миниатюр в очередь после коммита транзакции."""
+    if not post.image:
+        return
+    image_name = post.image.name
+    transaction.on_commit(
+        lambda: get_executor().submit(generate_thumbnails, image_name))
@@ -0,0 +1,204 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Пост при публикации раскладывается в FeedEntry каждого подписчика,
+поэтому страница ленты — один диапазон записей по индексу
+(user, pub_date) и выборка постов этой страницы по первичному ключу.
+Посты авторов, у которых подписчиков стало больше FANOUT_FOLLOWERS_LIMIT,
+не раскладываются, а подмешиваются при чтении (fan-out on read):
+у читателей таких авторов лента остаётся запросом по постам.
+Признак раскладки хранится в AuthorStats.fanned_out и возвращается,
+когда подписчиков становится не больше FANOUT_FOLLOWERS_RESUME:
+тогда посты автора дописываются в ленты в фоновом потоке.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Q
+
+from .models import AuthorStats, FeedEntry, Follow, Post
+from .settings import (FANOUT_BATCH_SIZE, FANOUT_FOLLOWERS_LIMIT,
+                       FANOUT_FOLLOWERS_RESUME, FANOUT_WORKERS)
+
+logger = logging.getLogger(__name__)
+
+# Ключ курсора для записей ленты: тот же порядок, что у постов.
+ENTRY_KEY = ('pub_date', 'post_id')
+# Сколько держится отметка о раскладке автора, если поток не снял её.
+RUNNING_TIMEOUT = 60 * 60
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS,
+                                       thread_name_prefix='fanout')
+    return _executor
+
+
+def heavy_authors():
+    """Авторы, чьи посты не раскладываются по лентам."""
+    return AuthorStats.objects.filter(fanned_out=False).values('author_id')
+
+
+def is_fanned_out(author_id):
+    return not heavy_authors().filter(author_id=author_id).exists()
+
+
+def _create_entries(entries):
+    """Вставляет записи пачками, не собирая их все в памяти."""
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, FANOUT_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if not is_fanned_out(post.author_id):
+        return
+    _create_entries(
+        FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in Follow.objects.filter(
+            author=post.author_id).values_list('user_id', flat=True)
+    )
+
+
+def add_author(user_id, author_id):
+    """Заполняет ленту постами автора после подписки на него."""
+    _create_entries(
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in Post.objects.filter(
+            author=author_id).values_list('id', 'pub_date').iterator()
+    )
+
+
+def add_follower(user_id, author_id):
+    """Лента нового подписчика; автор, переросший порог, не раскладывается."""
+    AuthorStats.objects.filter(
+        author_id=author_id, fanned_out=True,
+        followers_count__gt=FANOUT_FOLLOWERS_LIMIT).update(fanned_out=False)
+    if is_fanned_out(author_id):
+        add_author(user_id, author_id)
+
+
+def fan_out_author(author_id, after_id=0):
+    """Раскладывает посты автора с id больше after_id по лентам всех его
+    подписчиков, пачками постов; возвращает id последнего поста."""
+    followers = list(Follow.objects.filter(
+        author=author_id).values_list('user_id', flat=True))
+    while True:
+        posts = list(Post.objects.filter(
+            author=author_id, id__gt=after_id).order_by('id').values_list(
+            'id', 'pub_date')[:FANOUT_BATCH_SIZE])
+        if not posts:
+            return after_id
+        _create_entries(
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+            for user_id in followers
+        )
+        after_id = posts[-1][0]
+
+
+def resume_fan_out(author_id):
+    """Дописывает посты автора в ленты и снова включает его раскладку.
+
+    Подписчиков у такого автора не больше FANOUT_FOLLOWERS_RESUME.
+    """
+    stats = AuthorStats.objects.filter(
+        author_id=author_id, fanned_out=False,
+        followers_count__lte=FANOUT_FOLLOWERS_RESUME)
+    if not stats.exists():
+        return
+    last_id = fan_out_author(author_id)
+    if stats.update(fanned_out=True):
+        # Посты, опубликованные до включения раскладки, но после
+        # первого прохода.
+        fan_out_author(author_id, last_id)
+
+
+def _resume_in_background(author_id):
+    try:
+        resume_fan_out(author_id)
+    except Exception:
+        logger.exception('Не удалось разложить посты автора %s', author_id)
+    finally:
+        cache.delete(f'fanout:{author_id}:running')
+        # Соединения с БД у каждого потока свои.
+        connections.close_all()
+
+
+def schedule_resume(author_id):
+    """После фиксации ставит resume_fan_out в фон, один на автора."""
+
+    def submit():
+        if cache.add(f'fanout:{author_id}:running', True, RUNNING_TIMEOUT):
+            get_executor().submit(_resume_in_background, author_id)
+
+    transaction.on_commit(submit)
+
+
+def remove_author(user_id, author_id):
+    """Убирает посты автора из ленты после отписки.
+
+    Если подписчиков у нераскладываемого автора стало не больше
+    FANOUT_FOLLOWERS_RESUME, его посты дописываются в ленты оставшихся
+    подписчиков в фоне, не в запросе отписки.
+    """
+    FeedEntry.objects.filter(user=user_id, post__author=author_id).delete()
+    if AuthorStats.objects.filter(
+            author_id=author_id, fanned_out=False,
+            followers_count__lte=FANOUT_FOLLOWERS_RESUME).exists():
+        schedule_resume(author_id)
+
+
+def rebuild(users=None):
+    """Перестраивает ленты читателей по их текущим подпискам.
+
+    Нужны актуальные счётчики подписчиков (counters.recount): по ним
+    заново выбираются нераскладываемые авторы.
+    """
+    AuthorStats.objects.filter(
+        followers_count__gt=FANOUT_FOLLOWERS_LIMIT).update(fanned_out=False)
+    AuthorStats.objects.filter(
+        followers_count__lte=FANOUT_FOLLOWERS_LIMIT).update(fanned_out=True)
+    heavy = set(heavy_authors().values_list('author_id', flat=True))
+    follows = Follow.objects.all()
+    if users is not None:
+        follows = follows.filter(user__in=users)
+    for user_id, author_id in follows.values_list(
+            'user_id', 'author_id').iterator():
+        if author_id not in heavy:
+            add_author(user_id, author_id)
+
+
+def follow_feed(user):
+    """Лента подписок от новых постов к старым.
+
+    Записи FeedEntry (ключ курсора ENTRY_KEY, посты — entry_posts),
+    а если среди авторов есть нераскладываемые — сразу посты.
+    """
+    heavy = Follow.objects.filter(
+        user=user, author__in=heavy_authors()).values('author_id')
+    if not heavy.exists():
+        return FeedEntry.objects.filter(user=user).only(
+            *ENTRY_KEY).order_by('-pub_date', '-post_id')
+    return Post.objects.filter(
+        Q(id__in=FeedEntry.objects.filter(user=user).values('post_id'))
+        | Q(author__in=heavy)
+    ).feed()
+
+
+def entry_posts(entries):
+    """Посты записей ленты в их порядке, одним запросом."""
+    posts = Post.objects.feed().in_bulk(
+        [entry.post_id for entry in entries])
+    return [posts[entry.post_id] for entry in entries
+            if entry.post_id in posts]
@@ -1,52 +1,135 @@
-﻿from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+﻿from urllib.parse import urlencode
+
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.shortcuts import redirect
 from django.shortcuts import render, get_object_or_404
 
-from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
-from .settings import POSTS_PER_PAGE
-
-
-def pagination(request, posts):
-    return(Paginator(posts, POSTS_PER_PAGE).get_page(request.GET.get('page')))
-
+from core.concurrent import gather
+from core.replicas import read_from_replica
 
+from .caching import index_cache_version
+from .conditional import (conditional_page, follow_scopes, group_scopes,
+                          index_scopes, post_scopes, profile_scopes)
+from .exporting import FORMATS, export_response
+from .counters import author_stats
+from .forms import PostForm, CommentForm
+from .images import process_image
+from .models import Comment, FeedEntry, Post, Group, User, Follow
+from .paginators import CursorPaginator, ElidedPaginator, FeedPaginator
+from .search import SearchResults
+from .settings import (COMMENTS_PER_PAGE, CURSOR_PAGINATION,
+                       INDEX_CACHE_TIMEOUT, PAGE_WINDOW,
+                       PAGINATOR_COUNT_LIMIT, POSTS_PER_PAGE)
+from .thumbnails import schedule_thumbnails
+from .timeline import ENTRY_KEY, entry_posts, follow_feed
+
+
+def pagination(request, posts, key=('pub_date', 'id')):
+    cursor = request.GET.get('cursor')
+    if cursor is not None or CURSOR_PAGINATION:
+        return CursorPaginator(posts, POSTS_PER_PAGE, key).get_page(cursor)
+    return FeedPaginator(
+        posts, POSTS_PER_PAGE, count_limit=PAGINATOR_COUNT_LIMIT,
+        on_each_side=PAGE_WINDOW
+    ).get_page(request.GET.get('page'))
+
+
+def feed_page(request, posts):
+    """Страница с уже выполненным запросом, для gather()."""
+    page = pagination(request, posts)
+    page.object_list = list(page.object_list)
+    return page
+
+
+@read_from_replica
+@conditional_page(index_scopes)
 def index(request):
-    posts = Post.objects.all()
+    posts = Post.objects.feed()
     return render(request, 'posts/index.html', {
-        'page_obj': pagination(request, posts)})
+        'page_obj': pagination(request, posts),
+        'cache_timeout': INDEX_CACHE_TIMEOUT,
+        'cache_version': index_cache_version(),
+    })
 
 
+@read_from_replica
+@conditional_page(group_scopes)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    return render(request, 'posts/group_list.html', {
-        'group': group,
-        'page_obj': pagination(request, group.posts.all()),
-    })
+    return render(request, 'posts/group_list.html', gather(
+        group=lambda: get_object_or_404(Group, slug=slug),
+        page_obj=lambda: feed_page(
+            request, Post.objects.filter(group__slug=slug).feed()),
+    ))
 
 
+@read_from_replica
+@conditional_page(profile_scopes)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    following = (request.user.is_authenticated and request.user != author
-                 and Follow.objects.filter(user=request.user,
-                                           author=author).exists())
+    user = request.user
+    following = user.is_authenticated and user != author
     return render(request, 'posts/profile.html', {
         'author': author,
-        'page_obj': pagination(request, author.posts.all()),
-        'following': following
+        **gather(
+            stats=lambda: author_stats(author.id),
+            page_obj=lambda: feed_page(request, author.posts.feed()),
+            following=lambda: following and Follow.objects.filter(
+                user=user, author=author).exists(),
+        ),
     })
 
 
+@login_required
+def profile_export(request, username):
+    if username != request.user.username:
+        return redirect('posts:profile', username=username)
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in FORMATS:
+        export_format = 'csv'
+    return export_response(request.user.posts.all(), export_format,
+                           f'{username}-posts')
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page_obj': ElidedPaginator(
+            SearchResults(query), POSTS_PER_PAGE, on_each_side=PAGE_WINDOW
+        ).get_page(request.GET.get('page')),
+        'page_query': urlencode({'q': query}) + '&',
+    })
+
+
+def comments_page(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').only('text', 'created', 'post_id', 'author__username')
+    return CursorPaginator(
+        comments, COMMENTS_PER_PAGE, key=('created', 'id')
+    ).get_page(request.GET.get('cursor'))
+
+
+@read_from_replica
+@conditional_page(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    form = CommentForm()
-    context = {
-        'post': post,
-        'form': form}
+    context = gather(
+        post=lambda: get_object_or_404(Post, pk=post_id),
+        comments=lambda: comments_page(request, post_id),
+    )
+    context['stats'] = author_stats(context['post'].author_id)
+    context['form'] = CommentForm()
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('id'), pk=post_id)
+    return render(request, 'posts/includes/comments.html', {
+        'post_id': post_id,
+        'comments': comments_page(request, post_id)})
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -54,7 +137,14 @@ def post_create(request):
         return render(request, 'posts/create_post.html', {'form': form})
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    try:
+        process_image(post)
+    except ValidationError as error:
+        form.add_error('image', error)
+        return render(request, 'posts/create_post.html', {'form': form})
+    with transaction.atomic():
+        post.save()
+    schedule_thumbnails(post)
     return redirect('posts:profile', request.user)
 
 
@@ -69,8 +159,18 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
-        return redirect('posts:post_detail', post_id=post.id)
+        post = form.save(commit=False)
+        new_image = 'image' in form.changed_data
+        try:
+            if new_image:
+                process_image(post)
+        except ValidationError as error:
+            form.add_error('image', error)
+        else:
+            post.save()
+            if new_image:
+                schedule_thumbnails(post)
+            return redirect('posts:post_detail', post_id=post.id)
     return render(request, 'posts/create_post.html', {
         'form': form, 'is_edit': True, 'post_id': post_id})
 
@@ -86,24 +186,31 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@read_from_replica
 @login_required
+@conditional_page(follow_scopes)
 def follow_index(request):
-    return render(request, 'posts/follow.html', {
-        'page_obj': pagination(
-            request,
-            Post.objects.filter(author__following__user=request.user))})
+    feed = follow_feed(request.user)
+    if feed.model is not FeedEntry:
+        page_obj = pagination(request, feed)
+    else:
+        page_obj = pagination(request, feed, key=ENTRY_KEY)
+        page_obj.object_list = entry_posts(page_obj.object_list)
+    return render(request, 'posts/follow.html', {'page_obj': page_obj})
 
 
 @login_required
 def profile_follow(request, username):
     if username != request.user.username:
         author = get_object_or_404(User, username=username)
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    get_object_or_404(Follow, user=request.user,
-                      author__username=username).delete()
+    with transaction.atomic():
+        get_object_or_404(Follow, user=request.user,
+                          author__username=username).delete()
     return redirect('posts:profile', username=username)
@@ -0,0 +1,22 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.2 has no ASGI handler of its own, so core.asgi runs the WSGI
+application in a thread pool behind the server's event loop:
+
+    uvicorn yatube.asgi:application
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+django_application = get_wsgi_application()
+
+# Imported once settings are configured: ASGIHandler reads ASGI_THREADS.
+from core.asgi import ASGIHandler  # noqa: E402
+
+application = ASGIHandler(django_application)
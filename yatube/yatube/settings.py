@@ -32,14 +32,31 @@ ALLOWED_HOSTS = [
     'testserver',
 ]
 
+# Shared by all worker processes on the host (SQLite in WAL mode, LRU).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
+# manage.py test runs on an in-memory cache (core.testing); pytest gets the
+# same one from tests/conftest.py
+TEST_RUNNER = 'core.testing.TestRunner'
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Per-view query/template/total timings (core.middleware.TimingMiddleware)
+REQUEST_TIMING = False
+REQUEST_TIMING_CACHE = 'default'
+REQUEST_TIMING_WINDOW = 60
+REQUEST_TIMING_WINDOWS = 60
+# Seconds between flushes of per-process timing counters to the cache
+REQUEST_TIMING_FLUSH = 1
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -55,7 +72,17 @@ INSTALLED_APPS = [
     'sorl.thumbnail'
 ]
 
+# Sessions are read from the shared cache and written through to the DB;
+# the session user is resolved by core.auth.CachedModelBackend.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['core.auth.CachedModelBackend']
+USER_CACHE_TIMEOUT = 60 * 60
+# Users kept per process (core.auth)
+USER_CACHE_SIZE = 1000
+
 MIDDLEWARE = [
+    'core.middleware.TimingMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,7 +96,9 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to core.timing
+        'BACKEND': 'core.backends.templates.DjangoTemplates',
+        'NAME': 'django',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,18 +114,50 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# yatube.asgi runs views in this many threads per process (core.asgi)
+ASGI_THREADS = 32
+# Threads running a view's independent queries at once (core.concurrent),
+# shared by all ASGI_THREADS views; tasks that find the pool busy run in the
+# request thread, 0 runs them all there
+QUERY_WORKERS = 2 * ASGI_THREADS
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# SQLite in WAL mode with tuned pragmas; transactions take the write lock
+# up front and retry it (core.backends.sqlite3).
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'write_retries': 5,
+        },
     }
 }
 
+# Read replicas for feed and post pages (core.replicas.ReplicaRouter).
+# YATUBE_REPLICAS is a comma-separated list of SQLite files; locally they
+# are copies of the primary made by "manage.py sync_replicas".
+REPLICA_PATHS = [
+    path for path in os.environ.get('YATUBE_REPLICAS', '').split(',') if path
+]
+DATABASES.update({
+    f'replica{number}': {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    for number, path in enumerate(REPLICA_PATHS, 1)
+})
+DATABASE_REPLICAS = [f'replica{number}'
+                     for number in range(1, len(REPLICA_PATHS) + 1)]
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Seconds a client keeps reading from the primary after its own write
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators